@@ -1,6 +1,15 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
 class MetricsHostBypassMiddleware:
+    # Works in both modes so ASGI requests don't hop to a thread just to pass through it.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
         if request.path == '/metrics':
@@ -1,5 +1,6 @@
 import threading
 import contextvars
+from asgiref.sync import markcoroutinefunction
 
 
 #======================================== RequestMiddleware ============================================
@@ -22,8 +23,13 @@ def get_request():
 _request_var = contextvars.ContextVar("request_var")  
 
 class AsyncRequestMiddleware:
+    # Async-only: Django hands it an async get_response instead of adapting it through a thread.
+    sync_capable = False
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        markcoroutinefunction(self)
 
     async def __call__(self, request):
         _request_var.set(request)  
@@ -14,6 +14,7 @@ from pathlib import Path
 import environ
 from datetime import timedelta
 from celery.schedules import crontab
+from boto3.s3.transfer import TransferConfig
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,6 +29,9 @@ SECRET_KEY = env.str('SECRET_KEY')
 
 DEBUG = env.bool('DEBUG')
 
+# ASGI profile (docker-compose.asgi.yml): uvicorn workers, async middleware and the async read endpoints.
+ASGI_MODE = env.bool('ASGI_MODE', default=False)
+
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
 FRONTEND_DOMAIN = env.str('FRONTEND_DOMAIN')
 CSRF_TRUSTED_ORIGINS = env.list('CSRF_TRUSTED_ORIGINS', default=[])
@@ -58,6 +62,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # created apps
     'users',
@@ -96,7 +101,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'config.middleware.RequestMiddleware',
+    'config.middleware.AsyncRequestMiddleware' if ASGI_MODE else 'config.middleware.RequestMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     # 'allauth.account.middleware.AccountMiddleware',
     'django_prometheus.middleware.PrometheusAfterMiddleware',
@@ -139,7 +144,8 @@ DATABASES = {
         'PORT':  env.str('DB_PORT'),
         'USER':  env.str('USERNAME'),
         'PASSWORD': env.str('PASSWORD'),
-        'CONN_MAX_AGE': 600,  
+        # Under ASGI every request runs its sync code in a fresh thread, so persistent connections would pile up per thread.
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=0 if ASGI_MODE else 600),
         'OPTIONS': {
             'connect_timeout': 10,
         }
@@ -196,6 +202,13 @@ AWS_S3_FILE_OVERWRITE = False
 AWS_QUERYSTRING_AUTH = False  
 AWS_DEFAULT_ACL = 'public-read'  
 AWS_LOCAL_STORAGE = f'{BASE_DIR}/aws/'
+AWS_S3_MAX_POOL_CONNECTIONS = env.int('AWS_S3_MAX_POOL_CONNECTIONS', default=50)
+# Objects above the threshold move in parallel 8 MB parts (ranged GETs on download); also used by the storage for uploads.
+AWS_S3_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024, max_concurrency=8)
+# Batch downloads: workers x max_concurrency stays within the pool of the shared client.
+BUCKET_DOWNLOAD_WORKERS = env.int('BUCKET_DOWNLOAD_WORKERS', default=4)
+SHARED_DOWNLOADS_DIR = env.str('SHARED_DOWNLOADS_DIR', default='/app/shared_downloads/')
+BUCKET_LISTING_PAGE_SIZE = 1000
 
 MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/'
 
@@ -345,6 +358,10 @@ CELERY_BROKER_URL = env.str('URL_BROKER')
 CELERY_RESULT_BACKEND = env.str('REDIS_CELERY_RESULTS')
 # CELERY_RESULT_BACKEND = 'django-db'
 CELERY_RESULT_EXPIRES = 3600  
+# Long polling (?wait=) and server-sent events for task results; both wait on the result backend's pub/sub.
+TASK_RESULT_MAX_WAIT = 30
+TASK_EVENTS_TIMEOUT = 55
+TASK_RESULT_POLL_INTERVAL = 0.5
 
 # Celery Events for Monitoring
 CELERY_WORKER_SEND_TASK_EVENTS = True
@@ -377,9 +394,22 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'main.tasks.check_coupon_expiration',
         'schedule': crontab(minute='*/1'),
     },
+    'release_expired_reservations-every-minute': {
+        'task': 'main.tasks.release_expired_reservations',
+        'schedule': crontab(minute='*/1'),
+    },
+    'cancel_unpaid_orders-every-five-minute': {
+        'task': 'main.tasks.cancel_unpaid_orders',
+        'schedule': crontab(minute='*/5'),
+    },
 }
 
 
+# Checkout stock reservations
+STOCK_RESERVATION_TTL = 60 * 15
+UNPAID_ORDER_TIMEOUT = 60 * 30
+
+
 # Django Cache & Sessions
 CACHES = {
     "default": {
@@ -394,6 +424,14 @@ CACHES = {
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 CACHE_TTL = 60 * 15 
+CATEGORY_TREE_CACHE_TTL = 60 * 60 * 24
+AUTOCOMPLETE_CACHE_TTL = 60
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_P95_BUDGET_MS = 50
+CATALOGUE_CACHE_MAX_AGE = 30
+RESPONSE_CACHE_TTL = 60 * 10
+ASYNC_REDIS_OPTIONS = {"socket_keepalive": True, "health_check_interval": 30}
 
 
 # SOCIALACCOUNT_PROVIDERS = {
@@ -1,53 +1,185 @@
 from storages.backends.s3boto3 import S3Boto3Storage
 from botocore.exceptions import ClientError
+from botocore.config import Config
 from django.conf import settings
-import boto3
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from concurrent.futures import ThreadPoolExecutor
 import os
 import logging
+import threading
+import tempfile
+import hashlib
+import binascii
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+#======================================= Shared S3 Client ======================================
+
+_s3 = {}
+_s3_lock = threading.Lock()
+
+
+def get_s3_resource(storage=None):
+    """
+    Return the process-wide S3 resource for the connection options of `storage` (a default ArvanCloudStorage
+    when omitted), created on first use.
+    It is built the way S3Boto3Storage builds its resources, from the storage's credentials, endpoint, SSL and
+    verify options and its `client_config` (AWS_S3_SIGNATURE_VERSION, AWS_S3_ADDRESSING_STYLE, AWS_S3_CLIENT_CONFIG,
+    ...), on top of a pool of AWS_S3_MAX_POOL_CONNECTIONS keep-alive connections. Its client is thread-safe, so
+    credentials, endpoint setup and TLS handshakes are paid once per process instead of once per `Bucket()` or
+    storage thread. Storages configured differently get a shared resource of their own.
+    """
+    storage = storage or ArvanCloudStorage()
+    key = storage.shared_connection_key
+    resource = _s3.get(key)
+    if resource is None:
+        with _s3_lock:
+            resource = _s3.get(key)
+            if resource is None:
+                resource = _s3[key] = storage.create_shared_resource()
+    return resource
+
+
+def get_s3_client():
+    return get_s3_resource().meta.client
+
+
+def reset_s3_client():
+    """
+    Drop the shared client so the next use creates a new one.
+    Runs in every forked child (Celery prefork pool, gunicorn workers): sockets inherited from the parent
+    must not be shared between processes, and a lock held by another parent thread at fork time would never be released.
+    """
+    global _s3_lock
+    _s3.clear()
+    _s3_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_s3_client)
+
+
 #======================================= ArvanCloudStorage ====================================
 
 class ArvanCloudStorage(S3Boto3Storage):
+    """
+    Media storage on ArvanCloud that talks to S3 through a process-wide shared client.
+    S3Boto3Storage keeps one resource per thread, each with its own session and connection pool; here every
+    thread still gets its own resource object, but all of them wrap the client shared by storages (and buckets)
+    with the same connection options.
+    """
     location = "media"  
 
+    @cached_property
+    def shared_connection_key(self):
+        options = (self.access_key, self.secret_key, self.security_token, self.session_profile, self.region_name, self.use_ssl, self.endpoint_url, self.verify)
+        return (*options, repr(sorted(vars(self.client_config).items())))
+
+    def create_shared_resource(self):
+        # Options set explicitly in client_config win over the pool defaults.
+        config = Config(max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS, tcp_keepalive=True).merge(self.client_config)
+        return self._create_session().resource(
+            "s3",
+            region_name=self.region_name,
+            use_ssl=self.use_ssl,
+            endpoint_url=self.endpoint_url,
+            config=config,
+            verify=self.verify,
+        )
+
+    @property
+    def connection(self):
+        shared = get_s3_resource(self)
+        connection = getattr(self._connections, "connection", None)
+        # A resource built before a fork wraps the parent's client; replace it.
+        if connection is None or connection.meta.client is not shared.meta.client:
+            connection = self._connections.connection = type(shared)(client=shared.meta.client)
+        return connection
+
+    @property
+    def bucket(self):
+        if self._bucket is None or self._bucket.meta.client is not self.connection.meta.client:
+            self._bucket = self.connection.Bucket(self.bucket_name)
+        return self._bucket
+
+
+#======================================= Local ETag ============================================
+
+def is_folder_marker(key):
+    """
+    Whether `key` is an empty "folder" object, such as the "media/" keys consoles create for directories.
+    """
+    return key.endswith("/")
+
+
+def local_etag_matches(path, etag):
+    """
+    Whether the file at `path` has the S3 ETag `etag`.
+    A single-part ETag is the MD5 of the data. A multipart ETag ("<md5>-<parts>") is the MD5 of the part MD5s,
+    recomputed here with the configured multipart chunk size, the one uploads from this project use; a copy
+    uploaded with another part size never matches and is downloaded again.
+    """
+    etag = etag.strip('"')
+    digest, _, parts = etag.partition("-")
+    chunk_size = settings.AWS_S3_TRANSFER_CONFIG.multipart_chunksize if parts else None
+    if parts and -(-os.path.getsize(path) // chunk_size) != int(parts):
+        return False
+    part_digests = []
+    with open(path, "rb") as file:
+        md5 = hashlib.md5()
+        for block in iter(lambda: file.read(chunk_size or 1024 * 1024), b""):
+            if parts:
+                part_digests.append(hashlib.md5(block).digest())
+            else:
+                md5.update(block)
+    if parts:
+        return hashlib.md5(b"".join(part_digests)).hexdigest() == digest
+    return md5.hexdigest() == digest
+
 
 #======================================= Bucket ================================================
 
 class Bucket:
     def __init__(self):
-        session = boto3.session.Session()
-        self.connection = session.client(
-            service_name="s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY, 
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            region_name=settings.AWS_S3_REGION_NAME,
-        )
+        self.connection = get_s3_client()
     
-    def get_files(self):
+    def get_files(self, prefix=""):
         try:
-            res = self.connection.list_objects_v2(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
-            contents = res.get("Contents", [])
-            
-            return [
-                {
-                    "Key": str(obj["Key"]),
-                    "Size": obj["Size"],
-                    "LastModified": obj["LastModified"].isoformat() if "LastModified" in obj else None,
-                    "ETag": str(obj["ETag"]),
-                    "StorageClass": obj.get("StorageClass", "STANDARD")
-                }
-                for obj in contents
-            ]
+            return [file_info for page in self.iter_files(prefix) for file_info in page]
         except ClientError as error:
             logger.error(f"Error listing files: {error}")
             return []
 
+    def iter_files(self, prefix="", page_size=1000):
+        """
+        Yield the objects under `prefix` one page (at most `page_size` keys) at a time.
+        `list_objects_v2` stops at 1000 keys per call, so the listing follows `NextContinuationToken`
+        until the bucket reports it is no longer truncated. Errors are raised, not swallowed, so callers
+        never mistake a failed listing for a short one.
+        """
+        params = {"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Prefix": prefix, "MaxKeys": page_size}
+        while True:
+            res = self.connection.list_objects_v2(**params)
+            yield [self.file_info(obj) for obj in res.get("Contents", [])]
+            if not res.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = res["NextContinuationToken"]
+
+    @staticmethod
+    def file_info(obj):
+        return {
+            "Key": str(obj["Key"]),
+            "Size": obj["Size"],
+            "LastModified": obj["LastModified"].isoformat() if "LastModified" in obj else None,
+            "ETag": str(obj["ETag"]),
+            "StorageClass": obj.get("StorageClass", "STANDARD")
+        }
+
     def delete_file(self, key):
         try:
             return self.connection.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
@@ -56,7 +188,30 @@ class Bucket:
             return None
     
     
-    def download_file(self, key, local_path=None):
+    def delete_files(self, keys, batch_size=1000):
+        """
+        Delete many objects with `delete_objects`, up to 1000 keys (the S3 limit) per request.
+        Returns one entry per key: {"key", "deleted": True} or {"key", "deleted": False, "error"}.
+        A request that fails as a whole raises ClientError; deleting a key twice is harmless, so it can be retried.
+        """
+        results = []
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            res = self.connection.delete_objects(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": False}
+            )
+            errors = {error["Key"]: f"{error.get('Code')}: {error.get('Message')}" for error in res.get("Errors", [])}
+            for key in batch:
+                if key in errors:
+                    logger.error(f"Error deleting file {key}: {errors[key]}")
+                    results.append({"key": key, "deleted": False, "error": errors[key]})
+                else:
+                    results.append({"key": key, "deleted": True})
+        return results
+    
+    
+    def download_file(self, key, local_path=None, etag=None):
         try:
             if not local_path:
                 local_path = os.path.join(settings.AWS_LOCAL_STORAGE, key)
@@ -70,20 +225,75 @@ class Bucket:
                 # Assume it's already a full file path
                 local_file_path = local_path
             
-            # Ensure the directory exists (THIS LINE SHOULD STAY)
-            directory = os.path.dirname(local_file_path)
-            os.makedirs(directory, exist_ok=True, mode=0o755) 
-            
-            # Download the file (THIS LINE SHOULD STAY)
-            with open(local_file_path, "wb") as file:
-                self.connection.download_fileobj(settings.AWS_STORAGE_BUCKET_NAME, key, file)
-            
+            self.download_object(key, local_file_path, etag)
             return local_file_path
         except ClientError as error:
             logger.error(f"Error downloading file {key}: {error}")
             return None
     
     
+    def download_object(self, key, local_file_path, etag=None):
+        """
+        Download one object to `local_file_path` unless the file there already has the object's ETag.
+        Large objects are fetched as parallel ranged GETs according to AWS_S3_TRANSFER_CONFIG. The data is
+        written to a temporary file in the same directory and renamed into place, so readers never see a
+        partial file. `etag` saves the HEAD request when the caller already knows it (e.g. from a listing).
+        Returns False when the download was skipped; raises ClientError on failure.
+        """
+        if os.path.exists(local_file_path):
+            if etag is None:
+                etag = self.connection.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)["ETag"]
+            if local_etag_matches(local_file_path, etag):
+                logger.info(f"Skipped {key}: local copy is up to date")
+                return False
+        
+        # Ensure the directory exists (THIS LINE SHOULD STAY)
+        directory = os.path.dirname(local_file_path)
+        os.makedirs(directory, exist_ok=True, mode=0o755) 
+        
+        # Download the file (THIS LINE SHOULD STAY)
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                self.connection.download_fileobj(settings.AWS_STORAGE_BUCKET_NAME, key, file, Config=settings.AWS_S3_TRANSFER_CONFIG)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, local_file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return True
+    
+    
+    def download_files(self, files, local_dir=None, workers=None):
+        """
+        Download many objects into `local_dir`, keeping their key paths, over a pool of `workers` threads.
+        `files` holds keys or listing entries ({"Key", "ETag", ...}); with entries, unchanged local copies
+        are skipped without a HEAD request. Every transfer shares the process-wide client, so workers times
+        the transfer concurrency should stay within AWS_S3_MAX_POOL_CONNECTIONS.
+        Folder marker keys ("media/") have no file of their own and are reported as skipped.
+        Returns one entry per key: {"key", "path", "skipped"} or {"key", "error"}.
+        """
+        local_dir = os.path.abspath(local_dir or settings.SHARED_DOWNLOADS_DIR)
+        
+        def download(file_info):
+            key, etag = (file_info["Key"], file_info.get("ETag")) if isinstance(file_info, dict) else (file_info, None)
+            if is_folder_marker(key):
+                # Its path is the directory of the keys below it; writing it as a file would block them.
+                return {"key": key, "path": None, "skipped": True}
+            local_file_path = os.path.abspath(os.path.join(local_dir, key))
+            if os.path.commonpath([local_dir, local_file_path]) != local_dir:
+                return {"key": key, "error": "Key resolves outside the download directory"}
+            try:
+                downloaded = self.download_object(key, local_file_path, etag)
+                return {"key": key, "path": local_file_path, "skipped": not downloaded}
+            except (ClientError, OSError) as error:
+                logger.error(f"Error downloading file {key}: {error}")
+                return {"key": key, "error": str(error)}
+        
+        with ThreadPoolExecutor(max_workers=workers or settings.BUCKET_DOWNLOAD_WORKERS) as executor:
+            return list(executor.map(download, files))
+    
+    
     def get_file_url(self, key, expires=3600):
         try:
             return self.connection.generate_presigned_url(
@@ -96,6 +306,89 @@ class Bucket:
             return None
 
     
+#======================================= Bucket Listing ========================================
+
+class BucketListing:
+    """
+    Paged result store for a bucket listing, kept in the default cache (Redis) under the listing task's ID.
+
+    Each page is written as soon as it is listed, so clients can read the first pages while the task keeps
+    walking the bucket, and the Celery result only carries the summary instead of the whole file list.
+    Every run of the task (a retry included) is a new attempt: its pages live under their own keys, the pages
+    of the previous attempt are deleted, and cursors name the attempt they belong to, so a reader can never
+    mix pages of two runs.
+
+    Attributes:
+        listing_id (str): ID of the listing, the ID of the task that writes it.
+        timeout (int): Seconds pages and summary are kept; matches the lifetime of Celery results.
+
+    Methods:
+        start(prefix): Starts a new attempt and drops the pages of the previous one.
+        add_page(files): Stores the next page and updates the summary.
+        finish(): Marks the listing complete and returns its summary.
+        fail(error): Marks the listing failed once the task has no retries left, so readers stop waiting for pages.
+        get_summary(): Returns the summary, or None if the listing is unknown or expired.
+        get_page(attempt, number): Returns the files of a page, or None if it is not stored (yet).
+        encode_cursor(attempt, number): Returns the opaque cursor of a page.
+        decode_cursor(cursor): Returns the (attempt, number) of a cursor; raises ValueError if it is malformed.
+    """
+    key_prefix = "bucket_listing"
+
+    def __init__(self, listing_id, timeout=None):
+        self.listing_id = str(listing_id)
+        self.timeout = timeout or settings.CELERY_RESULT_EXPIRES
+        self.summary = {"listing_id": self.listing_id, "attempt": 0, "prefix": "", "pages": 0, "count": 0, "complete": False, "failed": False, "error": None}
+
+    def get_key(self, attempt=None, number=None):
+        key = f"{self.key_prefix}:{self.listing_id}"
+        return key if attempt is None else f"{key}:{attempt}:{number}"
+
+    def start(self, prefix=""):
+        previous = self.get_summary()
+        if previous:
+            cache.delete_many([self.get_key(previous["attempt"], number) for number in range(previous["pages"])])
+        attempt = previous["attempt"] + 1 if previous else 1
+        self.summary.update(attempt=attempt, prefix=prefix, pages=0, count=0, complete=False, failed=False, error=None)
+        cache.set(self.get_key(), self.summary, self.timeout)
+
+    def add_page(self, files):
+        number = self.summary["pages"]
+        self.summary["pages"] += 1
+        self.summary["count"] += len(files)
+        # Page before summary in one round trip: a reader never sees a page count ahead of the stored pages.
+        cache.set_many({self.get_key(self.summary["attempt"], number): files, self.get_key(): self.summary}, self.timeout)
+
+    def finish(self):
+        self.summary["complete"] = True
+        cache.set(self.get_key(), self.summary, self.timeout)
+        return dict(self.summary)
+
+    def fail(self, error):
+        self.summary.update(failed=True, error=str(error))
+        cache.set(self.get_key(), self.summary, self.timeout)
+        return dict(self.summary)
+
+    def get_summary(self):
+        return cache.get(self.get_key())
+
+    def get_page(self, attempt, number):
+        return cache.get(self.get_key(attempt, number))
+
+    @staticmethod
+    def encode_cursor(attempt, number):
+        return urlsafe_b64encode(json.dumps([attempt, number]).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            attempt, number = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        if not isinstance(attempt, int) or not isinstance(number, int) or number < 0:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return attempt, number
+
+
 #===============================================================================================
 
 # bucket = Bucket()
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.admin import SimpleListFilter
-from django.db.models import Q
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from .models import *
+from utilities.custom_admin import ExactMatchSearchMixin
 from uuid import uuid4
 
 
@@ -25,8 +27,6 @@ class CategoryFilter(SimpleListFilter):
     parameter_name = "Category"
     
     def lookups(self, request, model_admin):
-        parent_categories = Category.objects.filter(~Q(parent=None))
-        parents = set([category.parent for category in parent_categories])
         parents = Category.objects.filter(Category_parent__isnull=False).distinct()
         return [(obj.id, obj.name) for obj in parents]
     
@@ -39,8 +39,9 @@ class CategoryFilter(SimpleListFilter):
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ["id", "name", "parent", "slug", "created_at", "updated_at"]
+    list_select_related = ["parent"]
     list_filter = [CategoryFilter]
-    search_fields = ["slug", "parent"]
+    search_fields = ["slug__startswith", "name__startswith"]
     ordering = ["id"]
     
     
@@ -48,15 +49,21 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["id", "name", "slug", "current_stock", "category", "price", "created_at", "updated_at"]
-    list_filter = ["category"]
-    search_fields = ["slug"]
+    list_display = ["id", "name", "slug", "current_stock", "is_available", "category", "price", "created_at", "updated_at"]
+    list_select_related = ["category"]
+    list_filter = ["category", "is_available"]
+    # Also backs the product autocomplete widgets; both lookups are served by indexes (slug pattern, name trigram).
+    search_fields = ["slug__startswith", "name__trigram_word_similar"]
     ordering = ["slug"]
     
+    def get_queryset(self, request):
+        # The page's balances come from the same query through a join on the ProductStock summary row.
+        return super().get_queryset(request).annotate(stock_quantity=Coalesce(F("ProductStock_product__quantity"), 0))
+    
     def current_stock(self, obj):
-        # return Warehouse.total_stock(product=obj)
-        return obj.current_stock
+        return obj.stock_quantity
     current_stock.short_description = "Current Stock" 
+    current_stock.admin_order_field = "stock_quantity"
 
     
 #====================================== Gallery Admin =================================================
@@ -64,8 +71,10 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Gallery)
 class GalleryAdmin(admin.ModelAdmin):
     list_display = ["product"]
+    list_select_related = ["product"]
     list_filter = ["product"]
-    search_fields = ["product"]
+    autocomplete_fields = ["product"]
+    search_fields = ["product__slug__startswith"]
     ordering = ["product"]
 
 
@@ -74,7 +83,9 @@ class GalleryAdmin(admin.ModelAdmin):
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
     list_display = ["id", "user", "product", "price"]
-    search_fields = ["user", "product"]
+    list_select_related = ["user", "product"]
+    search_fields = ["user__username__startswith", "product__slug__startswith"]
+    autocomplete_fields = ["user", "product"]
     ordering = ["user", "id"]
 
     def price(self, obj):
@@ -85,14 +96,22 @@ class WishlistAdmin(admin.ModelAdmin):
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
-    list_display = ["id", "product", "current_stock", "is_available", "price", "warehouse_type", "stock", "created_at", "updated_at"]
+    list_display = ["id", "product", "current_stock", "price", "warehouse_type", "stock", "created_at", "updated_at"]
+    list_select_related = ["product"]
     list_filter = ["warehouse_type"]
-    search_fields = ["product", "warehouse_type"]
+    autocomplete_fields = ["product"]
+    search_fields = ["product__slug__startswith"]
     ordering = ["id"]
+    # Skips the unfiltered COUNT(*) over the whole ledger on every changelist load.
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            stock_quantity=Coalesce(F("product__ProductStock_product__quantity"), 0)
+        )
         
     def current_stock(self, obj):
-        # return Warehouse.total_stock(product=obj.product)
-        return obj.product.current_stock
+        return obj.stock_quantity
     current_stock.short_description = "Current Stock"
     
 
@@ -101,8 +120,9 @@ class WarehouseAdmin(admin.ModelAdmin):
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
     list_display = ["id", "code", "get_category_display", "discount_percentage", "max_usage", "usage_count", "is_active", "valid_from", "valid_to"]
+    list_select_related = ["category"]
     list_filter = ["is_active"]
-    search_fields = ["valid_from", "valid_to"]
+    search_fields = ["code__startswith"]
     ordering = ["is_active", "valid_to", "discount_percentage"]
     list_editable = ["is_active"]
 
@@ -116,13 +136,17 @@ class CouponAdmin(admin.ModelAdmin):
 class CartItemInLine(admin.TabularInline):
     model = CartItem
     extra = 1
+    autocomplete_fields = ["product"]
     readonly_fields = ["status", "grand_total"]
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["id", "customer", "status", "total_price"]
-    search_fields = ["online_customer", "in_person_customer", "products"]
+    list_select_related = ["online_customer", "in_person_customer"]
+    exact_search_fields = ["id"]
+    search_fields = ["online_customer__username__startswith", "in_person_customer__phone__startswith"]
+    autocomplete_fields = ["online_customer", "in_person_customer"]
     ordering = ["id"]
     inlines = [CartItemInLine]
     readonly_fields = ["status", "total_price"]
@@ -150,9 +174,13 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     
     
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["id", "cart", "product", "status", "quantity", "price", "grand_total"]
-    search_fields = ["id", "product", "status"]
+    list_select_related = ["cart__online_customer", "cart__in_person_customer", "product"]
+    exact_search_fields = ["id", "cart"]
+    search_fields = ["product__slug__startswith"]
+    autocomplete_fields = ["product"]
+    raw_id_fields = ["cart"]
     ordering = ["id"]
     readonly_fields = ["status", "grand_total", "price"]
     
@@ -163,10 +191,14 @@ class CartItemAdmin(admin.ModelAdmin):
 #====================================== Delivery Schedule Admin =======================================
 
 @admin.register(DeliverySchedule)
-class DeliveryScheduleAdmin(admin.ModelAdmin):
+class DeliveryScheduleAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["id", "customer", "date", "day", "time", "delivery_method", "delivery_cost"]
+    list_select_related = ["user"]
     list_filter = ["day", "time", "delivery_method"]
-    search_fields = ["date", "day", "time"]
+    autocomplete_fields = ["user"]
+    raw_id_fields = ["shopping_cart"]
+    exact_search_fields = ["shopping_cart", "date"]
+    search_fields = ["user__username__startswith"]
     ordering = ["id", "date", "time"]
     readonly_fields = ["delivery_cost"]
 
@@ -190,10 +222,14 @@ class DeliveryScheduleAdmin(admin.ModelAdmin):
 #====================================== Order Admin ===================================================
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["order_number", "customer", "order_type", "delivery_schedule", "payment_method", "total_amount", "amount_payable", "discount_applied", "status", "created_at", "updated_at"]
+    list_select_related = ["online_customer", "in_person_customer", "delivery_schedule"]
     list_filter = ["order_type", "status", "payment_method"]
-    search_fields = ["order_number", "online_customer", "in_person_customer", "payment_method"]
+    exact_search_fields = ["order_number"]
+    search_fields = ["order_number__startswith", "online_customer__username__startswith", "in_person_customer__phone__startswith"]
+    autocomplete_fields = ["online_customer", "in_person_customer"]
+    raw_id_fields = ["shopping_cart", "delivery_schedule"]
     ordering = ["created_at"]
     exclude = ["description", "order_type"]
     readonly_fields = ["total_amount"]
@@ -217,9 +253,12 @@ class OrderAdmin(admin.ModelAdmin):
 #====================================== Transaction Admin =============================================
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["reference_id", "order", "amount", "type", "is_paid", "created_at"]
-    search_fields = ["order", "reference_id"]
+    list_select_related = ["order__online_customer", "order__in_person_customer"]
+    exact_search_fields = ["reference_id", "order__order_number"]
+    search_fields = ["reference_id__startswith", "order__order_number__startswith"]
+    raw_id_fields = ["wallet", "order"]
     ordering = ["order"]
     readonly_fields = ["amount"]
     
@@ -240,9 +279,12 @@ class TransactionAdmin(admin.ModelAdmin):
 #====================================== Delivery Admin ================================================
 
 @admin.register(Delivery)
-class DeliveryAdmin(admin.ModelAdmin):
+class DeliveryAdmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["id", "order", "tracking_id", "status", "shipped_at", "delivered_at"]
-    search_fields = ["tracking_id"]
+    list_select_related = ["order__online_customer", "order__in_person_customer"]
+    exact_search_fields = ["tracking_id", "order__order_number"]
+    search_fields = ["tracking_id__startswith", "order__order_number__startswith"]
+    raw_id_fields = ["order"]
     ordering = ["order"]
     exclude = ["status"]
     
@@ -250,10 +292,13 @@ class DeliveryAdmin(admin.ModelAdmin):
 #====================================== Refund Admin ==================================================
 
 @admin.register(Refund)
-class RefundAddmin(admin.ModelAdmin):
+class RefundAddmin(ExactMatchSearchMixin, admin.ModelAdmin):
     list_display = ["wallet", "order", "amount", "method", "status", "created_at", "processed_at"]
-    search_fields = ["order"]
+    list_select_related = ["wallet__owner", "order__online_customer", "order__in_person_customer"]
+    exact_search_fields = ["order__order_number"]
+    search_fields = ["order__order_number__startswith"]
     ordering = ["order"]
+    raw_id_fields = ["wallet", "order"]
 
 
 #====================================== UserView Admin ================================================
@@ -261,8 +306,10 @@ class RefundAddmin(admin.ModelAdmin):
 @admin.register(UserView)
 class UserViewAdmin(admin.ModelAdmin):
     list_display = ["user", "product", "view_count", "last_seen"]
-    search_fields = ["product"]
+    list_select_related = ["user", "product"]
+    search_fields = ["product__slug__startswith", "user__username__startswith"]
     ordering = ["product", "view_count", "last_seen"]
+    autocomplete_fields = ["user", "product"]
 
 
 #====================================== Rating Admin ==================================================
@@ -270,8 +317,10 @@ class UserViewAdmin(admin.ModelAdmin):
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
     list_display = ["user", "product", "rating", "review", "created_at"]
+    list_select_related = ["user", "product"]
     list_filter = ["rating"]
-    search_fields = ["product", "rating"]
+    search_fields = ["product__slug__startswith", "user__username__startswith"]
+    autocomplete_fields = ["user", "product"]
     ordering = ["product", "rating"]
 
 
@@ -279,7 +328,8 @@ class RatingAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    pass
+    list_select_related = ["user"]
+    autocomplete_fields = ["user"]
 
 
 #======================================================================================================
\ No newline at end of file
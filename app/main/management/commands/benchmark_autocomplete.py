@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.core.cache import cache
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from statistics import median, quantiles
+from time import perf_counter
+from main.models import Product
+from main.views import ProductAutocompleteAPIView
+
+
+# ========================= BaseCommand =============================
+
+class Command(BaseCommand):
+    help = "Measures the p95 latency of the product autocomplete endpoint and fails when it exceeds the budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", nargs="*", default=[], help="Prefixes to query (defaults to prefixes of existing product names)")
+        parser.add_argument("--iterations", type=int, default=20, help="Number of rounds over all terms")
+        parser.add_argument("--budget-ms", type=float, default=settings.AUTOCOMPLETE_P95_BUDGET_MS, help="Allowed p95 latency in milliseconds")
+        parser.add_argument("--cold", action="store_true", help="Drop the cached result before every request to measure the database path")
+
+    def handle(self, *args, **options):
+        terms = options["terms"] or self.sample_terms()
+        if not terms:
+            raise CommandError("No terms to benchmark; pass --terms or add products first.")
+
+        factory = APIRequestFactory()
+        view = ProductAutocompleteAPIView.as_view()
+        url = reverse("autocomplete")
+        durations = []
+
+        for _ in range(options["iterations"]):
+            for term in terms:
+                if options["cold"]:
+                    cache.delete(ProductAutocompleteAPIView.cache_key(ProductAutocompleteAPIView.normalize_term(term)))
+                started = perf_counter()
+                response = view(factory.get(url, {"q": term}))
+                durations.append((perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"Autocomplete returned {response.status_code} for '{term}'.")
+
+        p95 = quantiles(durations, n=100)[94] if len(durations) > 1 else durations[0]
+        self.stdout.write(
+            f"{len(durations)} requests over {len(terms)} terms ({'cold' if options['cold'] else 'warm'} cache): "
+            f"p50 {median(durations):.2f} ms, p95 {p95:.2f} ms, max {max(durations):.2f} ms"
+        )
+        if p95 > options["budget_ms"]:
+            raise CommandError(f"p95 latency {p95:.2f} ms exceeds the budget of {options['budget_ms']:.2f} ms.")
+        self.stdout.write(self.style.SUCCESS(f"p95 latency is within the budget of {options['budget_ms']:.2f} ms."))
+
+    def sample_terms(self):
+        names = Product.objects.order_by("?").values_list("name", flat=True)[:20]
+        return sorted({name[:length] for name in names for length in (2, 3, 5) if len(name) >= length})
+
+
+# ===================================================================
+
+# python manage.py benchmark_autocomplete
+# python manage.py benchmark_autocomplete --cold --budget-ms 80
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.db import transaction
+from main.models import Warehouse, ProductStock
+from utilities.custom_cache import bump_catalogue_version
+
+
+# ========================= BaseCommand =============================
+
+class Command(BaseCommand):
+    help = "Rebuilds the ProductStock balances from the Warehouse ledger and reports any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drifted balances without fixing them (exits with an error if any are found)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows written per bulk query")
+
+    def handle(self, *args, **options):
+        check_only = options["check"]
+        batch_size = options["batch_size"]
+
+        try:
+            with transaction.atomic():
+                balances = {stock.product_id: stock for stock in ProductStock.objects.select_for_update().order_by("product_id")}
+                ledger = Warehouse.ledger_totals()
+
+                missing = [ProductStock(product_id=product_id, quantity=total) for product_id, total in ledger.items() if product_id not in balances]
+                drifted = []
+                for product_id, stock in balances.items():
+                    expected = ledger.get(product_id, 0)
+                    if stock.quantity != expected:
+                        self.stdout.write(f"Product {product_id}: balance {stock.quantity}, ledger {expected}")
+                        stock.quantity = expected
+                        drifted.append(stock)
+
+                if check_only:
+                    if missing or drifted:
+                        raise CommandError(f"{len(drifted)} drifted and {len(missing)} missing stock balances found.")
+                    self.stdout.write(self.style.SUCCESS(f"All {len(balances)} stock balances match the ledger."))
+                    return
+
+                ProductStock.objects.bulk_create(missing, batch_size=batch_size)
+                ProductStock.objects.bulk_update(drifted, ["quantity"], batch_size=batch_size)
+
+                # Same follow-up as apply_movements: availability flags, cached balances and catalogue responses.
+                changed = [stock.product_id for stock in missing + drifted]
+                for start in range(0, len(changed), batch_size):
+                    ProductStock.refresh_availability(changed[start:start + batch_size])
+                if changed:
+                    transaction.on_commit(lambda: ProductStock.write_through(changed))
+                    transaction.on_commit(bump_catalogue_version)
+
+        except CommandError:
+            raise
+        except Exception as error:
+            raise CommandError(f"Error rebuilding stock balances: {str(error)}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stock balances rebuilt: {len(missing)} created, {len(drifted)} corrected, {len(balances) - len(drifted)} unchanged."
+            )
+        )
+
+
+# ===================================================================
+
+# python manage.py rebuild_stock --check
+# python manage.py rebuild_stock
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.db import transaction
+from main.models import Product, ProductStock
+
+
+# ========================= BaseCommand =============================
+
+class Command(BaseCommand):
+    help = "Backfills Product.is_available from the ProductStock balances, writing only the products whose flag is wrong"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of products refreshed per UPDATE")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        before = Product.objects.in_stock().count()
+
+        try:
+            for start in range(0, len(product_ids), batch_size):
+                with transaction.atomic():
+                    ProductStock.refresh_availability(product_ids[start:start + batch_size])
+        except Exception as error:
+            raise CommandError(f"Error refreshing product availability: {str(error)}")
+
+        after = Product.objects.in_stock().count()
+        self.stdout.write(
+            self.style.SUCCESS(f"Availability refreshed for {len(product_ids)} products: {after} in stock (was {before}).")
+        )
+
+
+# ===================================================================
+
+# python manage.py refresh_availability
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+
+STOCK_DIRECTION = {"input": 1, "output": -1, "defective": -1, "sent_back": 0}
+
+
+def populate_product_stock(apps, schema_editor):
+    Warehouse = apps.get_model("main", "Warehouse")
+    ProductStock = apps.get_model("main", "ProductStock")
+    signed_stock = Case(
+        *[When(warehouse_type=warehouse_type, then=F("stock") * direction) for warehouse_type, direction in STOCK_DIRECTION.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    totals = Warehouse.objects.values("product_id").annotate(total=Sum(signed_stock)).order_by("product_id")
+    ProductStock.objects.bulk_create(
+        [ProductStock(product_id=row["product_id"], quantity=row["total"] or 0) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_alter_refund_options_remove_refund_reason_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ProductStock_product', serialize=False, to='main.product', verbose_name='Product')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantity')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Product Stock',
+                'verbose_name_plural': 'Product Stocks',
+            },
+        ),
+        migrations.RunPython(populate_product_stock, migrations.RunPython.noop),
+    ]
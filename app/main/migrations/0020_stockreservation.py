@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_productstock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstock',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reserved'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantity')),
+                ('status', models.CharField(choices=[('active', 'فعال'), ('committed', 'ثبت-شده'), ('released', 'آزاد-شده')], default='active', max_length=10, verbose_name='Status')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='StockReservation_cart', to='main.shoppingcart', verbose_name='Cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='StockReservation_product', to='main.product', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'indexes': [models.Index(fields=['cart', 'status'], name='main_stockr_cart_id_d3117d_idx'), models.Index(fields=['status', 'expires_at'], name='main_stockr_status_2c2808_idx')],
+            },
+        ),
+    ]
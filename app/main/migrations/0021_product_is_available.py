@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:28
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def populate_product_availability(apps, schema_editor):
+    Product = apps.get_model("main", "Product")
+    ProductStock = apps.get_model("main", "ProductStock")
+    Product.objects.filter(Exists(ProductStock.objects.filter(product_id=OuterRef("pk"), quantity__gt=0))).update(is_available=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_stockreservation'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='warehouse',
+            name='is_available',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_available',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Is Available'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', '-price'], name='main_produc_is_avai_69690a_idx'),
+        ),
+        migrations.RunPython(populate_product_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+def populate_category_path(apps, schema_editor):
+    Category = apps.get_model("main", "Category")
+    categories = list(Category.objects.only("id", "parent_id"))
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+    pending = [(category, "") for category in children.get(None, [])]
+    while pending:
+        category, parent_path = pending.pop()
+        category.path = f"{parent_path}{category.pk}/"
+        pending.extend((child, category.path) for child in children.get(category.pk, []))
+    Category.objects.bulk_update(categories, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_product_is_available'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Path'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='main_category_path_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_category_path, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, OuterRef, Subquery, TextField, Value
+
+
+PERSIAN_NORMALIZE_FROM = "يكىةۀأإآ\u200c"
+PERSIAN_NORMALIZE_TO = "یکیههااا "
+
+
+def populate_search_vector(apps, schema_editor):
+    Category = apps.get_model("main", "Category")
+    Product = apps.get_model("main", "Product")
+
+    def normalized(expression):
+        return Func(expression, Value(PERSIAN_NORMALIZE_FROM), Value(PERSIAN_NORMALIZE_TO), function="translate", output_field=TextField())
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1])
+    Product.objects.update(
+        search_vector=SearchVector(normalized(F("name")), config="simple", weight="A")
+        + SearchVector(normalized(category_name), config="simple", weight="B")
+        + SearchVector(normalized(F("description")), config="simple", weight="C")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Search Vector'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='main_product_search_gin_idx'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:37
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='main_product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
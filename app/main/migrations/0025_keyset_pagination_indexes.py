@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_product_name_trgm'),
+        ('users', '0004_remove_payment_is_sucessful_payment_is_paid_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['created_at', 'id'], name='main_catego_created_a2fa8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['online_customer', 'created_at', 'id'], name='main_order_online__17b2ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='main_produc_price_ad66ec_idx'),
+        ),
+    ]
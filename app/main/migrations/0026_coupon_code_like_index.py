@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['code'], name='main_coupon_code_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
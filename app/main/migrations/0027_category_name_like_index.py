@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_coupon_code_like_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name'], name='main_category_name_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models, transaction
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Case, When, F, Value, Exists, OuterRef, Subquery, Func
+from django.db.models.functions import Concat, Substr, Coalesce
+from django.contrib.postgres.search import SearchVector, SearchVectorField, SearchQuery, SearchRank, TrigramWordSimilarity
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.cache import cache
@@ -10,9 +13,13 @@ from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.conf import settings
 from logging import getLogger
+from collections import defaultdict
 from uuid import uuid4
-from utilities.utilities import code_generator
+from datetime import timedelta
+import time
+from utilities.utilities import code_generator, normalize_persian, PERSIAN_NORMALIZE_FROM, PERSIAN_NORMALIZE_TO
 from utilities.media_utils import upload_to, Arvan_storage
+from utilities.custom_cache import xfetch_get_many, xfetch_set_many, bump_catalogue_version
 from users.models import InPersonCustomer, Wallet
 
 
@@ -24,13 +31,21 @@ class Category(models.Model):
     """
     Represents a hierarchical product category in the system.
 
+    Attributes:
+        path: Materialized path of ancestor ids (e.g. "1/4/9/"); every descendant's path starts with it.
+
     Methods:
-        validate_parent(): Ensures a category cannot be its own parent.
-        get_all_children(): Recursively retrieves all subcategories of the current category.
+        validate_parent(): Ensures a category cannot be its own parent or be moved under one of its descendants.
+        get_all_children(): Retrieves all subcategories of the current category with one prefix query on `path`.
+        build_tree(nodes): Nests flat serialized categories under their parents in memory, without further queries.
+        invalidate_tree_cache(): Drops the cached category tree so the next request rebuilds it.
         save(): Automatically validates data and generates a unique slug for the category before saving.
     """
+    TREE_CACHE_KEY = "category_tree"
+    
     name = models.CharField(max_length=100, verbose_name="Category")
     parent = models.ForeignKey("Category", on_delete=models.CASCADE, related_name="Category_parent", null=True, blank=True, verbose_name="Parent")
+    path = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Path")
     slug = models.SlugField(unique=True, verbose_name="Slug")
     description = models.TextField(null=True, blank=True, verbose_name="Description")
     image = models.ImageField(upload_to=upload_to, storage=Arvan_storage, null=True, blank=True, verbose_name="Image")
@@ -46,13 +61,28 @@ class Category(models.Model):
     def validate_parent(self):
         if self.parent and self.parent.id == self.id:
             raise ValidationError("دسته نمی‌تواند والد خودش باشد.")
+        if self.pk and self.path and self.parent and self.parent.path.startswith(self.path):
+            raise ValidationError("دسته نمی‌تواند زیرمجموعه‌ی یکی از فرزندان خودش باشد.")
         
     def get_all_children(self):
-        children = []
-        for child in self.Category_parent.all():
-            children.append(child)
-            children.extend(child.get_all_children())
-        return children
+        return list(Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk).order_by("path"))
+    
+    def build_path(self):
+        return f"{self.parent.path if self.parent else ''}{self.pk}/"
+    
+    @staticmethod
+    def build_tree(nodes):
+        nodes = [{**node, "children": []} for node in nodes]
+        nodes_by_id = {node["id"]: node for node in nodes}
+        roots = []
+        for node in nodes:
+            parent = nodes_by_id.get(node["parent"])
+            (parent["children"] if parent else roots).append(node)
+        return roots
+    
+    @classmethod
+    def invalidate_tree_cache(cls):
+        cache.delete(cls.TREE_CACHE_KEY)
     
     def save(self, *args, **kwargs):
         self.full_clean()
@@ -64,39 +94,110 @@ class Category(models.Model):
                 unique_slug = f"{base_slug}-{num}"
                 num += 1
             self.slug = unique_slug
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous_path = Category.objects.filter(pk=self.pk).values_list("path", flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            path = self.build_path()
+            if path != previous_path:
+                Category.objects.filter(pk=self.pk).update(path=path)
+                if previous_path:
+                    # Re-parenting moves the whole subtree: swap the old prefix for the new one in a single UPDATE.
+                    Category.objects.filter(path__startswith=previous_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(path), Substr("path", len(previous_path) + 1))
+                    )
+            self.path = path
         
     class Meta:
         verbose_name = "Category"
         verbose_name_plural = "Categories"
-        indexes = [models.Index(fields=["name"]), models.Index(fields=["parent"])]
+        indexes = [
+            models.Index(fields=["name"]), 
+            models.Index(fields=["parent"]), 
+            models.Index(fields=["created_at", "id"]), 
+            models.Index(fields=["path"], name="main_category_path_like_idx", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["name"], name="main_category_name_like_idx", opclasses=["varchar_pattern_ops"]),
+        ]
 
 
 #====================================== Product Model =================================================
 
+class ProductQuerySet(models.QuerySet):
+    def in_stock(self):
+        return self.filter(is_available=True)
+    
+    def with_stock(self):
+        # One LEFT JOIN on the ProductStock summary row; products without movements get zero.
+        return self.annotate(
+            available_quantity=Coalesce(F("ProductStock_product__quantity") - F("ProductStock_product__reserved"), 0)
+        )
+    
+    def in_category_tree(self, category):
+        return self.filter(category__path__startswith=category.path)
+    
+    def search(self, text):
+        query = SearchQuery(normalize_persian(text), config=Product.SEARCH_CONFIG, search_type="websearch")
+        return self.filter(search_vector=query).annotate(rank=SearchRank(F("search_vector"), query)).order_by("-rank", "-price")
+    
+    def update_search_vector(self):
+        return self.update(search_vector=Product.search_document())
+    
+    def autocomplete(self, term, limit=10):
+        # `%>` is served by the trigram GIN index on name and tolerates typos and partial words.
+        term = normalize_persian(term)
+        return (
+            self.filter(name__trigram_word_similar=term)
+            .annotate(similarity=TrigramWordSimilarity(term, "name"))
+            .order_by("-similarity", "name")
+            .values("id", "name", "slug", "price")[:limit]
+        )
+
+
 class Product(models.Model):
     """
     Represents a product available for sale in the marketplace.
 
+    Attributes:
+        is_available: Denormalized flag that is true while the product has stock not held by reservations (`available_quantity` > 0); maintained by `ProductStock.refresh_availability`.
+        search_vector: Weighted full-text document of name (A), category name (B) and description (C), normalized for Persian.
+
     Methods:
+        search_document(): Builds the SQL expression stored in `search_vector`, using the language-neutral 'simple' configuration.
         save(): Generates a unique slug for the product based on its name to ensure URL uniqueness.
     """
+    # PostgreSQL ships no Persian stemmer, so documents are tokenized with 'simple' after normalizing Arabic letter variants.
+    SEARCH_CONFIG = "simple"
+    
     name = models.CharField(max_length=250, verbose_name="Product") 
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="Product_category", verbose_name="Category")
     slug = models.SlugField(unique=True, verbose_name="Slug")
     price = models.PositiveIntegerField(default=0, verbose_name="Price")
+    is_available = models.BooleanField(default=False, editable=False, verbose_name="Is Available")
     description = models.TextField(null=True, blank=True, verbose_name="Description")
     image = models.ImageField(upload_to=upload_to, storage=Arvan_storage, null=True, blank=True, verbose_name="Image")
     created_at = models.DateTimeField(auto_now_add=True, editable=False, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name="Search Vector")
+    
+    objects = ProductQuerySet.as_manager()
+    
+    @staticmethod
+    def search_document():
+        def normalized(expression):
+            return Func(expression, Value(PERSIAN_NORMALIZE_FROM), Value(PERSIAN_NORMALIZE_TO), function="translate", output_field=models.TextField())
+        # UPDATE cannot join, so the category name is read through a correlated subquery.
+        category_name = Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1])
+        return (
+            SearchVector(normalized(F("name")), config=Product.SEARCH_CONFIG, weight="A")
+            + SearchVector(normalized(category_name), config=Product.SEARCH_CONFIG, weight="B")
+            + SearchVector(normalized(F("description")), config=Product.SEARCH_CONFIG, weight="C")
+        )
     
     @cached_property
     def current_stock(self):
         return Warehouse.total_stock(product=self)
     
     def get_cached_stock(self):
-        cache_key = f"product_{self.id}_stock"
-        return cache.get_or_set(cache_key, lambda: Warehouse.total_stock(product=self), settings.CACHE_TTL)
+        return ProductStock.get_cached_many([self.pk])[self.pk]
     
     def __str__(self):
         return f"{self.name}"
@@ -115,7 +216,14 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
-        indexes = [models.Index(fields=["name"]), models.Index(fields=["price"])]
+        indexes = [
+            models.Index(fields=["name"]), 
+            models.Index(fields=["price"]), 
+            models.Index(fields=["price", "id"]), 
+            models.Index(fields=["is_available", "-price"]), 
+            GinIndex(fields=["search_vector"], name="main_product_search_gin_idx"),
+            GinIndex(fields=["name"], name="main_product_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
         
         
 #====================================== Gallery Model =================================================
@@ -170,34 +278,79 @@ class Warehouse(models.Model):
         product: The associated product in the warehouse.
         warehouse_type: The type of warehouse operation (e.g., input, output, defective, sent back).
         stock: The quantity of the product stored in the warehouse.
-        is_available: Indicates whether the product is available in stock.
         price: The cost price of the product for company.
         created_at: The timestamp when the warehouse entry was initially recorded.
         updated_at: The timestamp when the warehouse entry was last modified.
 
     Methods:
-        total_stock(product): Calculates the total stock for a given product by aggregating input, output, and defective stock levels.
+        total_stock(product): Returns the current stock of a product from its materialized `ProductStock` balance.
+        ledger_totals(): Aggregates the signed stock of every product directly from the ledger in one grouped query.
+        signed_stock(): Returns the quantity of this movement with the sign it applies to the product balance.
+        record_movements(movements): Inserts several movements with one `bulk_create` and applies their deltas in one pass.
+        save(): Records the movement and applies its delta to the product balance in the same transaction.
+        delete(): Removes the movement and reverts its delta from the product balance in the same transaction.
     """
     WAREHOUSE_TYPE = [("input", "ورودی"), ("output", "خروجی"), ("defective", "مرجوعی"), ("sent_back", "مرجوع-شده")]
+    STOCK_DIRECTION = {"input": 1, "output": -1, "defective": -1, "sent_back": 0}
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="Warehouse_product", verbose_name="Product")
     warehouse_type = models.CharField(max_length=10, choices=WAREHOUSE_TYPE, default="input", verbose_name="Warehouse Type")
     stock = models.PositiveIntegerField(default=0, verbose_name="Quantity")  
-    is_available = models.BooleanField(default=True, editable=False, verbose_name="Is Available") 
     price = models.IntegerField(default=0, verbose_name="Cost/Sell Price")
     created_at = models.DateTimeField(auto_now_add=True, editable=False, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
     
     @staticmethod
     def total_stock(product):
-        input_stock = Warehouse.objects.filter(product=product, warehouse_type="input").aggregate(total=Sum("stock"))["total"] or 0
-        output_stock = Warehouse.objects.filter(product=product, warehouse_type="output").aggregate(total=Sum("stock"))["total"] or 0
-        defective_stock = Warehouse.objects.filter(product=product, warehouse_type="defective").aggregate(total=Sum("stock"))["total"] or 0
-        total = input_stock - (output_stock + defective_stock)
-        return total
+        return ProductStock.get_quantity(product)
+    
+    @classmethod
+    def ledger_totals(cls):
+        signed_stock = Case(
+            *[When(warehouse_type=warehouse_type, then=F("stock") * direction) for warehouse_type, direction in cls.STOCK_DIRECTION.items()],
+            default=Value(0),
+            output_field=models.IntegerField(),
+        )
+        totals = cls.objects.values("product_id").annotate(total=Sum(signed_stock)).order_by("product_id")
+        return {row["product_id"]: row["total"] or 0 for row in totals}
+    
+    def signed_stock(self):
+        return self.STOCK_DIRECTION.get(self.warehouse_type, 0) * self.stock
+    
+    @classmethod
+    def record_movements(cls, movements):
+        # bulk_create bypasses save(), so the balance deltas of all movements are applied here in one pass.
+        with transaction.atomic():
+            records = cls.objects.bulk_create(movements)
+            deltas = defaultdict(int)
+            for record in records:
+                deltas[record.product_id] += record.signed_stock()
+            ProductStock.apply_movements(deltas)
+            return records
     
     def __str__(self):
-        return f"{self.product} - {self.total_stock(product=self.product)}"
+        return f"{self.product} - {self.get_warehouse_type_display()} ({self.stock})"
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"product", "product_id", "warehouse_type", "stock"} & set(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            deltas = defaultdict(int)
+            if self.pk:
+                previous = Warehouse.objects.filter(pk=self.pk).values("product_id", "warehouse_type", "stock").first()
+                if previous:
+                    deltas[previous["product_id"]] -= self.STOCK_DIRECTION.get(previous["warehouse_type"], 0) * previous["stock"]
+            super().save(*args, **kwargs)
+            deltas[self.product_id] += self.signed_stock()
+            ProductStock.apply_movements(deltas)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            product_id, signed_stock = self.product_id, self.signed_stock()
+            result = super().delete(*args, **kwargs)
+            ProductStock.apply_movements({product_id: -signed_stock})
+            return result
         
     class Meta:
         verbose_name = "Warehouse"
@@ -205,6 +358,120 @@ class Warehouse(models.Model):
         indexes = [models.Index(fields=["product"]), models.Index(fields=["warehouse_type"]), models.Index(fields=["stock"]), models.Index(fields=["created_at"])]
         
         
+#====================================== ProductStock Model ============================================
+
+class ProductStock(models.Model):
+    """
+    Represents the materialized stock balance of a product, kept in step with the Warehouse ledger.
+    Reading the stock of a product is a primary-key lookup on this table, regardless of how many movements exist.
+
+    Attributes:
+        product: The product whose balance is tracked (one row per product).
+        quantity: The current balance (input - output - defective).
+        reserved: The part of the balance held by active checkout reservations.
+        updated_at: The timestamp when the balance was last changed.
+
+    Methods:
+        available(): Returns the quantity that can still be reserved (balance minus active reservations).
+        get_quantity(product): Returns the balance of a product, or zero if it has no movements yet.
+        lock(product_ids): Locks the balance rows of the given products with SELECT ... FOR UPDATE in a deterministic order.
+        apply_movements(deltas): Adds signed quantity deltas to the balances of several products with a single UPDATE and bumps the catalogue version.
+        save_reserved(stocks): Writes the reserved quantities of locked balances, refreshes availability and bumps the catalogue version.
+        refresh_availability(product_ids): Flips `Product.is_available` only for the given products whose available stock crossed zero.
+        cache_key(product_id): Returns the Redis key of a product's cached balance.
+        fetch_quantities(product_ids): Reads the balances of many products with one query, defaulting to zero.
+        get_cached_many(product_ids): Returns cached balances for many products with one MGET, refreshing misses with one query.
+        write_through(product_ids): Re-reads the given balances and writes them to the cache in one pipelined call.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="ProductStock_product", verbose_name="Product")
+    quantity = models.IntegerField(default=0, verbose_name="Quantity")
+    reserved = models.PositiveIntegerField(default=0, verbose_name="Reserved")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+    
+    def available(self):
+        return self.quantity - self.reserved
+    
+    @staticmethod
+    def lock(product_ids):
+        product_ids = sorted(set(product_ids))
+        ProductStock.objects.bulk_create([ProductStock(product_id=product_id) for product_id in product_ids], ignore_conflicts=True)
+        stocks = ProductStock.objects.select_for_update(of=("self",)).select_related("product").filter(product_id__in=product_ids).order_by("product_id")
+        return {stock.product_id: stock for stock in stocks}
+    
+    @staticmethod
+    def get_quantity(product):
+        product_id = product.pk if isinstance(product, Product) else product
+        return ProductStock.objects.filter(product_id=product_id).values_list("quantity", flat=True).first() or 0
+    
+    @staticmethod
+    def apply_movements(deltas):
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            ProductStock.objects.bulk_create([ProductStock(product_id=product_id) for product_id in sorted(deltas)], ignore_conflicts=True)
+            ProductStock.objects.filter(product_id__in=deltas).update(
+                quantity=Case(
+                    *[When(product_id=product_id, then=F("quantity") + delta) for product_id, delta in deltas.items()],
+                    default=F("quantity"),
+                ),
+                updated_at=now(),
+            )
+            ProductStock.refresh_availability(deltas)
+            product_ids = list(deltas)
+            transaction.on_commit(lambda: ProductStock.write_through(product_ids))
+            # Catalogue responses expose `available_quantity`, so any balance change makes cached pages and ETags stale,
+            # including bulk movements (checkout, restores) that never send Warehouse signals.
+            transaction.on_commit(bump_catalogue_version)
+    
+    @staticmethod
+    def save_reserved(stocks):
+        stocks = list(stocks)
+        ProductStock.objects.bulk_update(stocks, ["reserved"])
+        ProductStock.refresh_availability([stock.product_id for stock in stocks])
+        # Catalogue responses expose `available_quantity`, which is net of reservations, so holds change them too.
+        transaction.on_commit(bump_catalogue_version)
+    
+    @staticmethod
+    def refresh_availability(product_ids):
+        product_ids = list(product_ids)
+        # Same net quantity as `available_quantity`, so `?in_stock=true` never lists a product with nothing left to reserve.
+        in_stock = Exists(ProductStock.objects.filter(product_id=OuterRef("pk"), quantity__gt=F("reserved")))
+        # Only rows whose flag actually changes are written, so steady-state movements leave the product row untouched.
+        flipped = Product.objects.filter(pk__in=product_ids, is_available=False).filter(in_stock).update(is_available=True)
+        flipped += Product.objects.filter(pk__in=product_ids, is_available=True).exclude(in_stock).update(is_available=False)
+        if flipped:
+            # Catalogue responses expose the flag, so cached pages and validators must change with it.
+            transaction.on_commit(bump_catalogue_version)
+    
+    @staticmethod
+    def cache_key(product_id):
+        return f"product_{product_id}_stock"
+    
+    @staticmethod
+    def fetch_quantities(product_ids):
+        quantities = dict(ProductStock.objects.filter(product_id__in=product_ids).values_list("product_id", "quantity"))
+        return {product_id: quantities.get(product_id, 0) for product_id in product_ids}
+    
+    @staticmethod
+    def get_cached_many(product_ids):
+        keys_by_id = {product_id: ProductStock.cache_key(product_id) for product_id in product_ids}
+        return xfetch_get_many(keys_by_id, ProductStock.fetch_quantities, settings.CACHE_TTL)
+    
+    @staticmethod
+    def write_through(product_ids):
+        started = time.time()
+        quantities = ProductStock.fetch_quantities(product_ids)
+        xfetch_set_many({ProductStock.cache_key(product_id): quantity for product_id, quantity in quantities.items()}, time.time() - started, settings.CACHE_TTL)
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.quantity}"
+    
+    class Meta:
+        verbose_name = "Product Stock"
+        verbose_name_plural = "Product Stocks"
+        
+        
 #====================================== Coupon Model ==================================================
 
 class Coupon(models.Model):
@@ -252,7 +519,7 @@ class Coupon(models.Model):
     class Meta:
         verbose_name = "Coupon"
         verbose_name_plural = "Coupons"
-        indexes = [models.Index(fields=["is_active"]), models.Index(fields=["max_usage"]), models.Index(fields=["usage_count"]), models.Index(fields=["valid_from"]), models.Index(fields=["valid_to"]),]
+        indexes = [models.Index(fields=["is_active"]), models.Index(fields=["max_usage"]), models.Index(fields=["usage_count"]), models.Index(fields=["valid_from"]), models.Index(fields=["valid_to"]), models.Index(fields=["code"], name="main_coupon_code_like_idx", opclasses=["varchar_pattern_ops"]),]
         
 
 #====================================== ShoppingCart Model ============================================
@@ -272,7 +539,7 @@ class ShoppingCart(models.Model):
         customer(): Returns the associated customer (either online or in-person).
         validate_customer(): Ensures a shopping cart has either an online or in-person customer (but not both).
         calculate_total_price(): Computes the total price based on items in the cart.
-        place_order(): Converts the cart items into a warehouse stock record when an order is placed.
+        place_order(): Commits the stock held for the cart into warehouse output records when an order is placed (only once per cart).
         clear_cart(): Removes all items from the cart and resets the total price.
         save(): Validates data and ensures the total price is updated after modifications.
     """
@@ -285,20 +552,16 @@ class ShoppingCart(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_TYPES, default="active", verbose_name="Cart Status")
     
     def calculate_total_price(self):
-        return sum(item.grand_total for item in CartItem.objects.filter(cart=self))
+        return CartItem.objects.filter(cart=self).aggregate(total=Sum("grand_total"))["total"] or 0
     
     def customer(self):
         return self.online_customer if self.online_customer else self.in_person_customer
     
     def place_order(self):
         with transaction.atomic():
-            for item in CartItem.objects.filter(cart=self):
-                Warehouse.objects.create(
-                    product=item.product,
-                    warehouse_type="output",
-                    stock=item.quantity,
-                    price=item.product.price
-                )
+            if StockReservation.objects.filter(cart=self, status="committed").exists():
+                return
+            StockReservation.commit(self)
     
     def mark_as_processed(self):
         self.status = "processed"
@@ -314,7 +577,7 @@ class ShoppingCart(models.Model):
                 cart_items.update(status="processed")
                 
     def __str__(self):
-        return f"{self.id} - {self.online_customer.username if self.online_customer else self.in_person_customer.first_name+' '+self.in_person_customer.last_name}"
+        return f"{self.id} - {self.customer()}"
 
     def clean(self):
         self.validate_customer()
@@ -357,7 +620,7 @@ class CartItem(models.Model):
     Methods:
         get_product_price(): Returns the price of the associated product.
         validate_quantity(): Ensures the quantity is greater than zero.
-        validate_stock(): Confirms the requested quantity does not exceed available stock.
+        validate_stock(): Confirms the requested quantity does not exceed the stock not held by other carts.
         validate_grand_total(): Updates the `grand_total` field based on the product price and quantity.
         save(): Ensures data integrity before storing the item in the cart.
     """
@@ -370,7 +633,7 @@ class CartItem(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_TYPES, default="active", verbose_name="Status")
     
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} in {self.cart.online_customer.username if self.cart.online_customer else self.cart.in_person_customer.first_name+' '+self.cart.in_person_customer.last_name}'s Cart"
+        return f"{self.quantity} x {self.product.name} in {self.cart.customer()}'s Cart"
     
     def get_product_price(self):
         return self.product.price
@@ -385,9 +648,12 @@ class CartItem(models.Model):
             raise ValidationError("تعداد باید بیشتر از صفر باشد.")
     
     def validate_stock(self):
-        total_stock = Warehouse.total_stock(product=self.product)
-        if self.quantity > total_stock:
-            raise ValidationError(f"موجودی ناکافی برای {self.product.name}. تعداد درخواستی: {self.quantity}, موجودی: {total_stock}")
+        stock = ProductStock.objects.filter(product_id=self.product_id).first()
+        available = stock.available() if stock else 0
+        # Stock held for this cart is set aside for it, so only other carts' holds reduce what it can take.
+        available += StockReservation.objects.filter(cart_id=self.cart_id, product_id=self.product_id, status="active").aggregate(total=Sum("quantity"))["total"] or 0
+        if self.quantity > available:
+            raise ValidationError(f"موجودی ناکافی برای {self.product.name}. تعداد درخواستی: {self.quantity}, موجودی: {max(available, 0)}")
 
     def validate_grand_total(self):
         self.grand_total = self.get_product_price() * self.quantity
@@ -402,6 +668,138 @@ class CartItem(models.Model):
         indexes = [models.Index(fields=["cart"]), models.Index(fields=["product"])]
 
 
+class StockReservation(models.Model):
+    """
+    Represents a quantity of a product held for a shopping cart between checkout steps.
+
+    Lifecycle:
+        - active: The quantity is held for the cart until `expires_at` and counted in `ProductStock.reserved`.
+        - committed: The cart was ordered and the quantity was written to the Warehouse as an output movement.
+        - released: The hold expired, or the order was canceled or left unpaid and the quantity was returned.
+
+    Attributes:
+        cart: The shopping cart the quantity is held for.
+        product: The reserved product.
+        quantity: The reserved quantity.
+        status: The current state of the reservation.
+        expires_at: The moment after which an active reservation is released automatically.
+        created_at: The timestamp when the reservation was created.
+
+    Methods:
+        reserve(cart, quantities): Validates and holds stock for a cart in one locked critical section.
+        commit(cart): Converts the holds of a cart into Warehouse output movements when its order is placed.
+        release(reservations): Returns active holds to the available stock.
+        restore(cart): Returns the committed stock of a canceled order to the Warehouse.
+    """
+    STATUS_TYPES = [("active", "فعال"), ("committed", "ثبت-شده"), ("released", "آزاد-شده")]
+    
+    cart = models.ForeignKey(ShoppingCart, on_delete=models.CASCADE, related_name="StockReservation_cart", verbose_name="Cart")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="StockReservation_product", verbose_name="Product")
+    quantity = models.PositiveIntegerField(verbose_name="Quantity")
+    status = models.CharField(max_length=10, choices=STATUS_TYPES, default="active", verbose_name="Status")
+    expires_at = models.DateTimeField(verbose_name="Expires At")
+    created_at = models.DateTimeField(auto_now_add=True, editable=False, verbose_name="Created At")
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for cart {self.cart_id} ({self.status})"
+    
+    @staticmethod
+    def insufficient_stock_error(stock, quantity):
+        return ValidationError(f"موجودی ناکافی برای {stock.product.name}. تعداد درخواستی: {quantity}, موجودی: {max(stock.available(), 0)}")
+    
+    @classmethod
+    def reserve(cls, cart, quantities):
+        quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+        if not quantities:
+            return []
+        expires_at = now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+        with transaction.atomic():
+            stocks = ProductStock.lock(quantities)
+            for product_id, quantity in quantities.items():
+                stock = stocks[product_id]
+                if quantity > stock.available():
+                    raise cls.insufficient_stock_error(stock, quantity)
+                stock.reserved += quantity
+            ProductStock.save_reserved(stocks.values())
+            return cls.objects.bulk_create(
+                [cls(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at) for product_id, quantity in quantities.items()]
+            )
+    
+    @classmethod
+    def commit(cls, cart):
+        items = list(CartItem.objects.filter(cart=cart).select_related("product"))
+        requested = defaultdict(int)
+        for item in items:
+            requested[item.product_id] += item.quantity
+        with transaction.atomic():
+            # Holds on products removed from the cart after reserving are released too, so their rows are locked as well.
+            held_ids = cls.objects.filter(cart=cart, status="active").values_list("product_id", flat=True)
+            stocks = ProductStock.lock(set(requested) | set(held_ids))
+            holds = list(cls.objects.select_for_update().filter(cart=cart, status="active"))
+            held = defaultdict(int)
+            for hold in holds:
+                held[hold.product_id] += hold.quantity
+            missing = set(held) - set(stocks)
+            if missing:
+                stocks.update(ProductStock.lock(missing))
+            for product_id, quantity in held.items():
+                stock = stocks[product_id]
+                stock.reserved = max(stock.reserved - quantity, 0)
+            for product_id, quantity in requested.items():
+                stock = stocks[product_id]
+                if quantity > stock.available():
+                    raise cls.insufficient_stock_error(stock, quantity)
+            ProductStock.save_reserved(stocks.values())
+            cls.objects.filter(pk__in=[hold.pk for hold in holds]).update(status="released")
+            cls.objects.bulk_create(
+                [cls(cart=cart, product_id=product_id, quantity=quantity, status="committed", expires_at=now()) for product_id, quantity in requested.items()]
+            )
+            Warehouse.record_movements(
+                [Warehouse(product=item.product, warehouse_type="output", stock=item.quantity, price=item.product.price) for item in items]
+            )
+    
+    @classmethod
+    def release(cls, reservations):
+        product_ids = set(reservations.filter(status="active").values_list("product_id", flat=True))
+        if not product_ids:
+            return 0
+        with transaction.atomic():
+            stocks = ProductStock.lock(product_ids)
+            holds = list(reservations.select_for_update().filter(status="active"))
+            for hold in holds:
+                stock = stocks.get(hold.product_id)
+                if stock:
+                    stock.reserved = max(stock.reserved - hold.quantity, 0)
+            ProductStock.save_reserved(stocks.values())
+            return cls.objects.filter(pk__in=[hold.pk for hold in holds]).update(status="released")
+    
+    @classmethod
+    def restore(cls, cart):
+        with transaction.atomic():
+            cls.release(cls.objects.filter(cart=cart))
+            committed = list(cls.objects.select_for_update().select_related("product").filter(cart=cart, status="committed"))
+            if committed:
+                movements = [(reservation.product, reservation.quantity) for reservation in committed]
+                cls.objects.filter(pk__in=[reservation.pk for reservation in committed]).update(status="released")
+            elif not cls.objects.filter(cart=cart).exists():
+                # Carts ordered before reservations existed have no allocation records, so their items are restored as they are.
+                # Released records are written for them, so a later restore of the same cart finds nothing left to return.
+                movements = [(item.product, item.quantity) for item in CartItem.objects.filter(cart=cart).select_related("product")]
+                cls.objects.bulk_create(
+                    [cls(cart=cart, product=product, quantity=quantity, status="released", expires_at=now()) for product, quantity in movements]
+                )
+            else:
+                movements = []
+            Warehouse.record_movements(
+                [Warehouse(product=product, warehouse_type="input", stock=quantity, price=product.price) for product, quantity in movements]
+            )
+    
+    class Meta:
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        indexes = [models.Index(fields=["cart", "status"]), models.Index(fields=["status", "expires_at"])]
+
+
 #====================================== Delivery Schedule Model =======================================
 
 class DeliverySchedule(models.Model):
@@ -505,8 +903,9 @@ class DeliverySchedule(models.Model):
         return 20000
     
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # `day` is derived from `date`, so it is filled in before full_clean() checks that it is not blank.
         self.day = self.date.strftime("%A").lower()
+        self.full_clean()
         self.delivery_cost = self.calculate_delivery_cost()
         super().save(*args, **kwargs)
 
@@ -573,14 +972,7 @@ class Order(models.Model):
     
     def restore_stock(self):
         if self.status == "canceled":
-            with transaction.atomic():
-                for item in CartItem.objects.filter(cart=self.shopping_cart):
-                    Warehouse.objects.create(
-                        product=item.product,
-                        warehouse_type="input",
-                        stock=item.quantity,
-                        price=item.product.price
-                    )
+            StockReservation.restore(self.shopping_cart)
                     
     def __str__(self):
         return f"Order {self.id} by {self.customer()} ({self.get_order_type_display()})" if self.customer() else f"Order {self.id} ({self.get_order_type_display()})"
@@ -637,7 +1029,13 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
-        indexes = [models.Index(fields=["online_customer"]), models.Index(fields=["in_person_customer"]), models.Index(fields=["status"]), models.Index(fields=["order_type"])]
+        indexes = [
+            models.Index(fields=["online_customer"]), 
+            models.Index(fields=["in_person_customer"]), 
+            models.Index(fields=["status"]), 
+            models.Index(fields=["order_type"]), 
+            models.Index(fields=["online_customer", "created_at", "id"]),
+        ]
 
 
 #====================================== Transaction Model =============================================
@@ -674,7 +1072,7 @@ class Transaction(models.Model):
     # related_object = GenericForeignKey("content_type", "object_id")
 
     def __str__(self):
-        wallet_info = f"Wallet {self.wallet.id}" if self.wallet else "No Wallet"
+        wallet_info = f"Wallet {self.wallet_id}" if self.wallet_id else "No Wallet"
         return f"{self.type} of {self.amount} for {wallet_info}"
     
     def clean(self):
@@ -742,7 +1140,7 @@ class ReturnRequest(models.Model):
     inspected_at = models.DateTimeField(blank=True, null=True, verbose_name="Inspected At")
     
     def __str__(self):
-        return f"ReturnRequest for Order {self.order.id} - {self.status}"
+        return f"ReturnRequest for Order {self.order_id} - {self.status}"
 
     class Meta:
         indexes = [
@@ -794,7 +1192,7 @@ class Refund(models.Model):
     processed_at = models.DateTimeField(blank=True, null=True, verbose_name="Processed At")
 
     def __str__(self):
-        return f"Refund for Order {self.order.id} - {self.amount} ({self.status})"
+        return f"Refund for Order {self.order_id} - {self.amount} ({self.status})"
 
     def clean(self):
         if self.amount > self.order.amount_payable:
@@ -832,7 +1230,7 @@ class Delivery(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Delivered At")
 
     def __str__(self):
-        return f"Delivery for Order {self.order.id}"
+        return f"Delivery for Order {self.order_id}"
         
     class Meta:
         verbose_name = "Delivery"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from collections import defaultdict
 from .models import *
 from users.models import *
 
@@ -18,12 +19,28 @@ class CategorySerializer(serializers.ModelSerializer):
         return CategorySerializer(obj.Category_parent.all(), many=True).data
         
         
+class CategoryTreeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ["id", "name", "parent", "slug", "description", "image"]
+        
+        
 #====================================== Product Serializer =================================================
 
 class ProductSerializer(serializers.ModelSerializer):
+    in_stock = serializers.BooleanField(source="is_available", read_only=True)
+    available_quantity = serializers.SerializerMethodField()
+    
     class Meta:
         model = Product
-        fields = ["id", "name", "category", "slug", "price", "description", "image"]
+        fields = ["id", "name", "category", "slug", "price", "description", "image", "in_stock", "available_quantity"]
+        
+    def get_available_quantity(self, obj):
+        # Listings annotate this with `Product.objects.with_stock()`; the lookup is only a fallback for single instances.
+        if hasattr(obj, "available_quantity"):
+            return obj.available_quantity
+        stock = ProductStock.objects.filter(product=obj).first()
+        return stock.available() if stock else 0
         
         
 #====================================== Wishlist Serializer ================================================
@@ -54,13 +71,27 @@ class CartItemSerializer(serializers.ModelSerializer):
         return obj.product.name
         
         
+class CartItemInputSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+    
+    
 class ShoppingCartSerializer(serializers.Serializer):
-    cart_items = CartItemSerializer(many=True, write_only=True)
+    cart_items = CartItemInputSerializer(many=True, write_only=True)
     total_price = serializers.ReadOnlyField()
     
     class Meta:
         model = ShoppingCart
         fields = ["cart_items", "total_price"] 
+        
+    def validate_cart_items(self, value):
+        # Resolve every product of the cart with a single IN query instead of one lookup per line.
+        products = Product.objects.in_bulk({item["product"] for item in value})
+        for item in value:
+            if item["product"] not in products:
+                raise serializers.ValidationError(f"محصولی با شناسه {item['product']} یافت نشد.")
+            item["product"] = products[item["product"]]
+        return value
     
     def create(self, validated_data):
         cart_items_data = validated_data.pop("cart_items")
@@ -69,10 +100,17 @@ class ShoppingCartSerializer(serializers.Serializer):
         try:
             with transaction.atomic():
                 cart = ShoppingCart.objects.create(**validated_data)
-                for cart_item_data in cart_items_data:
-                    CartItem.objects.create(cart=cart, **cart_item_data)
-                cart.total_price = cart.calculate_total_price()
-                cart.save(update_fields=["total_price"])
+                cart_items = [CartItem(cart=cart, **cart_item_data) for cart_item_data in cart_items_data]
+                quantities = defaultdict(int)
+                for cart_item in cart_items:
+                    cart_item.validate_quantity()
+                    cart_item.validate_grand_total()
+                    quantities[cart_item.product_id] += cart_item.quantity
+                StockReservation.reserve(cart, quantities)
+                # bulk_create bypasses CartItem.save() and the update_cart_total_price signal, so the total is written once here.
+                CartItem.objects.bulk_create(cart_items)
+                cart.total_price = sum(cart_item.grand_total for cart_item in cart_items)
+                ShoppingCart.objects.filter(pk=cart.pk).update(total_price=cart.total_price)
                 return cart
         except ValidationError as error:
             raise serializers.ValidationError({"error": str(error)})
@@ -183,6 +221,10 @@ class OrderSerializer(serializers.ModelSerializer):
                     coupon.refresh_from_db()
                 except Coupon.DoesNotExist:
                     raise serializers.ValidationError("کد تخفیف اشتباه است.")
+            try:
+                cart.place_order()
+            except ValidationError as error:
+                raise serializers.ValidationError(error.messages)
             order = Order.objects.create(**validated_data)
             cart.clear_cart()
             return order
@@ -201,6 +243,12 @@ class OrderSerializer(serializers.ModelSerializer):
         return cart, delivery
 
 
+class OrderListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ["id", "order_number", "order_type", "payment_method", "total_amount", "amount_payable", "status", "created_at"]
+        
+        
 #====================================== Order Cancellation Serializer =======================================
 
 class OrderCancellationSerializer(serializers.ModelSerializer):
@@ -212,10 +260,12 @@ class OrderCancellationSerializer(serializers.ModelSerializer):
         # Without explicitly calling `validate()`, DRF would only validate `validated_data`, not instance attributes like `status` and `delivery_schedule.date` and those checks are crucial for preventing unwanted cancellations.
         self.validate(validated_data)
         # self.validate({"status": instance.status})  # Directly validate instance attributes
-        instance.status = "canceled"
-        instance.shopping_cart.status = "abandoned"
-        instance.save(update_fields=["status"])
-        instance.shopping_cart.save(update_fields=["status"])
+        with transaction.atomic():
+            instance.status = "canceled"
+            instance.restore_stock()
+            instance.shopping_cart.status = "abandoned"
+            instance.save(update_fields=["status"])
+            instance.shopping_cart.save(update_fields=["status"])
         return instance
     
     def validate(self, attrs):
@@ -230,6 +280,8 @@ class OrderCancellationSerializer(serializers.ModelSerializer):
         delivery_hour = int(instance.delivery_schedule.time.split("_")[0])
         if instance.status in ["shipped", "completed"]:
             raise serializers.ValidationError("سفارش تکمیل شده یا ارسال شده نمیتواند لغو شود.")
+        if instance.status == "canceled":
+            raise serializers.ValidationError("این سفارش قبلا لغو شده است.")
         if instance.delivery_schedule.date < crr_date or (instance.delivery_schedule.date == crr_date and delivery_hour <= crr_hour + 2):
             raise serializers.ValidationError({"error": "لغو سفارش کمتر از دو ساعت به ارسال امکان پذیر نیست."})  
         return attrs
@@ -5,6 +5,7 @@ from logging import getLogger
 from django.db import transaction
 from .models import *
 from utilities.utilities import *
+from utilities.custom_cache import bump_catalogue_version
 
 #==================================== UpdateCoupon Signal ===============================================
 
@@ -32,15 +33,36 @@ def check_coupon_expiration(sender, instance, **kwargs):
         logger.error(f"Error in check_coupon_expiration signal: {error}", exc_info=True)
 
 
-#==================================== UpdateWarehouse Signal ===========================================
+#==================================== Catalogue Version Signal =========================================
 
-@receiver(post_save, sender=Warehouse)
-def handle_update_stock(sender, instance, created, **kwargs):
-    product = instance.product
-    total_stock = Warehouse.total_stock(product=product)
-    is_available = total_stock > 0
-    # Update directly without triggering save()
-    Warehouse.objects.filter(product=product).update(is_available=is_available)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Gallery)
+@receiver([post_save, post_delete], sender=Warehouse)
+def invalidate_catalogue(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
+#==================================== UpdateCategory Signal ============================================
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, instance, **kwargs):
+    transaction.on_commit(Category.invalidate_tree_cache)
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_products_search(sender, instance, created, **kwargs):
+    if not created:
+        Product.objects.filter(category=instance).update_search_vector()
+
+
+#==================================== UpdateProduct Signal =============================================
+
+@receiver(post_save, sender=Product)
+def refresh_product_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"name", "description", "category", "category_id"} & set(update_fields):
+        Product.objects.filter(pk=instance.pk).update_search_vector()
 
 
 #==================================== UpdateOrder Signal ===============================================
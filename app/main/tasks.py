@@ -1,9 +1,11 @@
 from celery import shared_task
 from django.utils.timezone import now, localtime
 from django.core.cache import cache
+from django.conf import settings
 import logging
 import time
-from django.db import models
+from django.db import models, transaction
+from datetime import timedelta
 from .models import *
 
 
@@ -55,4 +57,47 @@ def check_coupon_expiration():
         logger.error(f"Error in check_coupon_expiration task: {error}", exc_info=True)
 
 
+#==================================== Stock Reservation Celery ====================================
+
+@shared_task(rate_limit="10/m")
+def release_expired_reservations():
+    start_time = time.time()
+    try:
+        expired_reservations = StockReservation.objects.filter(status="active", expires_at__lt=now())
+        released_count = StockReservation.release(expired_reservations)
+        if released_count:
+            logger.info(f"Released {released_count} expired stock reservations")
+        else:
+            logger.debug("No expired stock reservations found")
+        duration = time.time() - start_time
+        logger.info(f"Stock reservation release completed in {duration:.2f} seconds")
+    except Exception as error:
+        logger.error(f"Error in release_expired_reservations task: {error}", exc_info=True)
+
+
+@shared_task(rate_limit="10/m")
+def cancel_unpaid_orders():
+    start_time = time.time()
+    cutoff = now() - timedelta(seconds=settings.UNPAID_ORDER_TIMEOUT)
+    canceled_count = 0
+    try:
+        for order_id in Order.objects.filter(status="waiting", payment_method="online", created_at__lt=cutoff).values_list("id", flat=True):
+            with transaction.atomic():
+                order = Order.objects.select_for_update(skip_locked=True).filter(pk=order_id, status="waiting", payment_method="online").first()
+                if not order:
+                    continue
+                Order.objects.filter(pk=order.pk).update(status="canceled")
+                order.status = "canceled"
+                order.restore_stock()
+                ShoppingCart.objects.filter(pk=order.shopping_cart_id).update(status="abandoned")
+                CartItem.objects.filter(cart_id=order.shopping_cart_id).update(status="abandoned")
+                canceled_count += 1
+        if canceled_count:
+            logger.info(f"Canceled {canceled_count} unpaid orders and returned their stock")
+        duration = time.time() - start_time
+        logger.info(f"Unpaid order check completed in {duration:.2f} seconds")
+    except Exception as error:
+        logger.error(f"Error in cancel_unpaid_orders task: {error}", exc_info=True)
+
+
 #==================================================================================================
\ No newline at end of file
@@ -1,8 +1,10 @@
 from django.urls import path, re_path, include
+from django.conf import settings
 from rest_framework.routers import DefaultRouter
 from .views import (get_product_price, get_cart_price, get_amount_payable, WishlistModelViewSet, ShoppingCartAPIView, DeliveryScheduleAPIView,
                     DeliveryScheduleChangeAPIView, CategoryModelViewSet, ProductModelViewSet, OrderAPIView, OrderCancellationAPIView, 
-                    RatingModelViewSet, TransactionModelViewSet, DeliveryAPIView, UserViewModelViewSet)
+                    RatingModelViewSet, TransactionModelViewSet, DeliveryAPIView, UserViewModelViewSet, ProductAutocompleteAPIView,
+                    aget_product_price, aget_cart_price, aget_amount_payable, AsyncCategoryTreeView, AsyncProductListView, AsyncProductDetailView)
 
 
 router =  DefaultRouter()
@@ -19,6 +21,7 @@ urlpatterns = [
     path("get_product_price/<int:product_id>/", get_product_price, name="get_product_price"),
     path("get_cart_price/<int:cart_id>/", get_cart_price, name="get_cart_price"),
     path("get_amount_payable/<int:order_id>/", get_amount_payable, name="get_amount_payable"),
+    path("autocomplete/", ProductAutocompleteAPIView.as_view(), name="autocomplete"),
     
     path("add_schedule/", DeliveryScheduleAPIView.as_view(), name="add_schedule"),
     path("change_schedule/<int:delivery_id>/", DeliveryScheduleChangeAPIView.as_view(), name="change_schedule"),
@@ -30,4 +33,17 @@ urlpatterns = [
 ] 
 
 
+# ASGI profile: the hot read endpoints are served by async views placed ahead of their sync counterparts.
+async_urlpatterns = [
+    path("get_product_price/<int:product_id>/", aget_product_price),
+    path("get_cart_price/<int:cart_id>/", aget_cart_price),
+    path("get_amount_payable/<int:order_id>/", aget_amount_payable),
+    path("categories/tree/", AsyncCategoryTreeView.as_view()),
+    path("products/", AsyncProductListView.as_view()),
+    path("products/<int:pk>/", AsyncProductDetailView.as_view()),
+]
+
+if settings.ASGI_MODE:
+    urlpatterns = async_urlpatterns + urlpatterns
+
 urlpatterns += router.urls
\ No newline at end of file
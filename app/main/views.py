@@ -7,15 +7,22 @@ from rest_framework.request import Request
 from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.conf import settings
 from logging import getLogger
 from django.utils.timezone import localtime, now, make_aware
 from datetime import timedelta, datetime
+from hashlib import md5
 from .models import *
 from .serializers import *
 from utilities.custom_permission import CheckOwnershipPermission
+from utilities.custom_pagination import ProductPagination, CategoryPagination, OrderPagination
+from utilities.custom_cache import ConditionalGetMixin, ResponseCacheMixin, acache_get
+from utilities.custom_async import AsyncCatalogueView
+from utilities.utilities import normalize_persian
 
 
 #====================================== admin View ===================================================
@@ -51,32 +58,146 @@ def get_amount_payable(request, order_id):
       return JsonResponse({"amount_payable": order.amount_payable})
     except Exception as error:
       return JsonResponse({"error": str(error)}, status=404)
+
+
+# Async versions for the ASGI profile; they read only the columns they return.
+async def aget_product_price(request, product_id):
+    try:
+        price = await Product.objects.values_list("price", flat=True).aget(id=product_id)
+        return JsonResponse({"price": price})
+    except Product.DoesNotExist:
+        return JsonResponse({"error": "Product not found"}, status=404)
+    except Exception as error:
+        return JsonResponse({"error": str(error)}, status=500)
+
+
+async def aget_cart_price(request, cart_id):
+    try:
+        total_price = await ShoppingCart.objects.values_list("total_price", flat=True).aget(id=cart_id)
+        delivery_cost = await DeliverySchedule.objects.filter(shopping_cart=cart_id).values_list("delivery_cost", flat=True).afirst()
+        return JsonResponse({"total_amount": total_price + (delivery_cost or 0)})
+    except ShoppingCart.DoesNotExist:
+        return JsonResponse({"error": "Shopping cart not found"}, status=404)
+    except Exception as error:
+        return JsonResponse({"error": str(error)}, status=500)
+
+
+async def aget_amount_payable(request, order_id):
+    try:
+        amount_payable = await Order.objects.values_list("amount_payable", flat=True).aget(id=order_id)
+        return JsonResponse({"amount_payable": amount_payable})
+    except Order.DoesNotExist:
+        return JsonResponse({"error": "Order not found"}, status=404)
+    except Exception as error:
+        return JsonResponse({"error": str(error)}, status=500)
   
   
 #====================================== Gategory View ================================================
 
-class CategoryModelViewSet(viewsets.ModelViewSet):
+class CategoryModelViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
-    queryset = Category.objects.all().order_by("parent")
+    queryset = Category.objects.all().order_by("parent", "id")
     serializer_class = CategorySerializer
     http_method_names = ["get"]
-    pagination_class = PageNumberPagination
+    pagination_class = CategoryPagination
     filter_backends = [SearchFilter, DjangoFilterBackend]
     filterset_fields = ["parent"]
     search_fields = ["slug", "parent__name"]
+    
+    @action(detail=False, methods=["get"], url_path="tree", pagination_class=None, filter_backends=[])
+    def tree(self, request):
+        return self.conditional_response(request, self.get_tree)
+    
+    def get_tree(self, request):
+        tree = cache.get(Category.TREE_CACHE_KEY)
+        if tree is None:
+            # One query for the whole catalogue; nesting happens in memory instead of one query per node.
+            nodes = CategoryTreeSerializer(Category.objects.order_by("id"), many=True).data
+            tree = Category.build_tree(nodes)
+            cache.set(Category.TREE_CACHE_KEY, tree, settings.CATEGORY_TREE_CACHE_TTL)
+        return Response(tree, status=status.HTTP_200_OK)
+
+
+class AsyncCategoryTreeView(AsyncCatalogueView):
+    viewset_class = CategoryModelViewSet
+    basename = "categories"
+    action = "tree"
+    
+    async def get_cached_data(self, handler, request, version):
+        return await acache_get(Category.TREE_CACHE_KEY)
 
 
 #====================================== Product View =================================================
 
-class ProductModelViewSet(viewsets.ModelViewSet):
+class ProductModelViewSet(ConditionalGetMixin, ResponseCacheMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
-    queryset = Product.objects.all().order_by("-price")
+    queryset = Product.objects.with_stock().defer("search_vector").order_by("-price", "-id")
     serializer_class = ProductSerializer
     http_method_names = ["get"]
-    pagination_class = PageNumberPagination
+    pagination_class = ProductPagination
     filter_backends = [SearchFilter, DjangoFilterBackend]
-    filterset_fields = ["category"]
+    filterset_fields = ["category", "is_available"]
     search_fields = ["slug", "name", "category__name"]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        category_tree = self.request.query_params.get("category_tree")
+        if category_tree:
+            if not category_tree.isdigit():
+                raise serializers.ValidationError({"category_tree": "شناسه دسته باید عدد باشد."})
+            category = Category.objects.filter(pk=category_tree).only("path").first()
+            queryset = queryset.in_category_tree(category) if category else queryset.none()
+        in_stock = self.request.query_params.get("in_stock")
+        if in_stock in ("true", "1"):
+            queryset = queryset.in_stock()
+        elif in_stock in ("false", "0"):
+            queryset = queryset.filter(is_available=False)
+        search = self.request.query_params.get("q", "").strip()
+        if search:
+            queryset = queryset.search(search)
+        return queryset
+
+
+class AsyncProductListView(AsyncCatalogueView):
+    viewset_class = ProductModelViewSet
+    basename = "products"
+    action = "list"
+
+
+class AsyncProductDetailView(AsyncCatalogueView):
+    viewset_class = ProductModelViewSet
+    basename = "products"
+    action = "retrieve"
+    detail = True
+
+
+class ProductAutocompleteAPIView(APIView):
+    permission_classes = [AllowAny]
+    
+    @staticmethod
+    def normalize_term(term):
+        return normalize_persian(term).strip().lower()
+    
+    @staticmethod
+    def cache_key(term):
+        return f"product_autocomplete:{md5(term.encode()).hexdigest()}"
+    
+    @extend_schema(
+        parameters = [OpenApiParameter("q", str, description="Typed prefix of the product name.")],
+        responses = {
+            200: "List of matching products (id, name, slug, price).",
+        }
+    )
+    def get(self, request):
+        term = self.normalize_term(request.query_params.get("q", ""))
+        if len(term) < settings.AUTOCOMPLETE_MIN_LENGTH:
+            return Response([], status=status.HTTP_200_OK)
+        cache_key = self.cache_key(term)
+        results = cache.get(cache_key)
+        if results is None:
+            results = list(Product.objects.autocomplete(term, limit=settings.AUTOCOMPLETE_LIMIT))
+            cache.set(cache_key, results, settings.AUTOCOMPLETE_CACHE_TTL)
+        return Response(results, status=status.HTTP_200_OK)
 
 
 #====================================== Wishlist View ================================================
@@ -124,8 +245,9 @@ class ShoppingCartAPIView(viewsets.ViewSet):
             cart = serializer.save()
             # cart_items_count = cart.CartItem_cart.count()
             # serialized_cart_items = CartItemSerializer(cart.CartItem_cart.all(), many=True).data
-            cart_items_count = CartItem.objects.filter(cart=cart).count()  
-            serialized_cart_items = CartItemSerializer(CartItem.objects.filter(cart=cart), many=True).data  
+            cart_items = list(CartItem.objects.filter(cart=cart).select_related("product"))
+            cart_items_count = len(cart_items)
+            serialized_cart_items = CartItemSerializer(cart_items, many=True).data  
             return Response(
                 {
                     "message": "کالاهای شما اضافه شد.", 
@@ -233,6 +355,17 @@ class DeliveryScheduleChangeAPIView(APIView):
 class OrderAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @extend_schema(
+        responses = {
+            200: OrderListSerializer(many=True),
+        }
+    )
+    def get(self, request):
+        paginator = OrderPagination()
+        orders = Order.objects.filter(online_customer=request.user).order_by("-created_at", "-id")
+        page = paginator.paginate_queryset(orders, request, view=self)
+        return paginator.get_paginated_response(OrderListSerializer(page, many=True).data)
+    
     @extend_schema(
         request = OrderSerializer,
         responses = {
@@ -282,15 +415,17 @@ class OrderCancellationAPIView(APIView):
     )        
     def put(self, request, order_id):
         try:
-            order = Order.objects.filter(id=order_id, online_customer=request.user).first()
-            if not order:
-                return Response({"error": "سفارش مورد نظر یافت نشد و یا شما امکان دسترسی به آن را ندارید."}, status=status.HTTP_404_NOT_FOUND)
-            crr_datetime = localtime(now())
-            mocked_time = make_aware(datetime(2025, 6, 1, 18, 1, 0))
-            serializer = OrderCancellationSerializer(instance=order, data={}, context={"current_time": crr_datetime}, partial=True)
-            if not serializer.is_valid():
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            serializer.save()
+            with transaction.atomic():
+                # The order row stays locked until the cancellation commits, so concurrent cancels are validated one after another.
+                order = Order.objects.select_for_update().filter(id=order_id, online_customer=request.user).first()
+                if not order:
+                    return Response({"error": "سفارش مورد نظر یافت نشد و یا شما امکان دسترسی به آن را ندارید."}, status=status.HTTP_404_NOT_FOUND)
+                crr_datetime = localtime(now())
+                mocked_time = make_aware(datetime(2025, 6, 1, 18, 1, 0))
+                serializer = OrderCancellationSerializer(instance=order, data={}, context={"current_time": crr_datetime}, partial=True)
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                serializer.save()
             return Response({"message": "سفارش با موفقیت لغو شد."}, status=status.HTTP_200_OK)
         except Exception as error:
             return Response({"error": f"An unexpected error occurred: {str(error)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -26,6 +26,12 @@
             }
         }
         $("#id_shopping_cart, #id_delivery_schedule").on("change", updateTotalAmount);
+        // Raw-id lookup popups set the value without firing "change".
+        const dismissRelatedLookupPopup = window.dismissRelatedLookupPopup;
+        window.dismissRelatedLookupPopup = function (win, chosenId) {
+            dismissRelatedLookupPopup(win, chosenId);
+            updateTotalAmount();
+        };
         updateTotalAmount();
     });
 })(django.jQuery);
\ No newline at end of file
@@ -25,6 +25,12 @@
             }
         }
         $("#id_order").on("change", updateAmountPayable);
+        // Raw-id lookup popups set the value without firing "change".
+        const dismissRelatedLookupPopup = window.dismissRelatedLookupPopup;
+        window.dismissRelatedLookupPopup = function (win, chosenId) {
+            dismissRelatedLookupPopup(win, chosenId);
+            updateAmountPayable();
+        };
         updateAmountPayable();
     });
 })(django.jQuery);
\ No newline at end of file
@@ -16,7 +16,7 @@ class CustomUserAdmin(UserAdmin):
         "id", "username", "first_name", "last_name", "email", "user_type","is_active", 
         "is_premium", "is_admin", "is_superuser", "joined_at", "updated_at",)
     list_filter = ("user_type", "is_active", "is_premium", "is_admin", "is_superuser",)
-    list_search = ("username",)
+    search_fields = ("username__startswith", "email__startswith",)
     list_editable = ()
     ordering = ("id",)
     # change_list_template = "admin/customuser_change_list.html"
@@ -94,8 +94,10 @@ admin.site.register(CustomUser, CustomUserAdmin)
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "phone", "gender",)
+    list_select_related = ("user",)
     list_filter = ("gender",)
-    list_search = ("user", "phone",)
+    autocomplete_fields = ("user",)
+    search_fields = ("phone__startswith", "user__username__startswith",)
     ordering = ("user",)
     
     
@@ -105,15 +107,17 @@ class UserProfileAdmin(admin.ModelAdmin):
 class InPersonCustomerAdmin(admin.ModelAdmin):
     list_display = ("id", "last_name", "first_name", "phone",)
     ordering = ("last_name", "first_name",)
-    search_fields = ("phone",)
+    search_fields = ("phone__startswith",)
 
 #==================================== Wallet Admin ==============================================
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
     list_display = ("owner", "balance", "status", "created_at", "updated_at",)
+    list_select_related = ("owner",)
+    autocomplete_fields = ("owner",)
     ordering = ("id",)
-    search_fields = ("owner",)
+    search_fields = ("owner__username__startswith",)
 
     
 #==================================== Payment Admin =============================================
@@ -121,7 +125,9 @@ class WalletAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ("payment_id", "user", "is_paid", "payment_date",)
-    list_search = ("payment_id",)
+    list_select_related = ("user",)
+    search_fields = ("payment_id__startswith",)
+    autocomplete_fields = ("user",)
     ordering = ("payment_id",)
     
     
@@ -130,7 +136,9 @@ class PaymentAdmin(admin.ModelAdmin):
 @admin.register(PremiumSubscription)
 class PremiumSubscriptionAdmin(admin.ModelAdmin):
     list_display = ("user", "start_date", "expiry_date", "is_active",)
-    list_search = ("user",)
+    list_select_related = ("user",)
+    search_fields = ("user__username__startswith",)
+    autocomplete_fields = ("user",)
     ordering = ("user",)
     list_editable = ("is_active",)
     
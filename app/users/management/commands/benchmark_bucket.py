@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median, quantiles
+from time import perf_counter
+import boto3
+from config.storages import Bucket, reset_s3_client
+
+
+# ========================= BaseCommand =============================
+
+class Command(BaseCommand):
+    help = "Compares bucket task throughput with a new boto3 client per task against the shared per-process client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Number of task bodies run per mode")
+        parser.add_argument("--concurrency", type=int, default=4, help="Task bodies run in parallel, like the threads of a worker")
+        parser.add_argument("--prefix", default="", help="Key prefix listed by every task body")
+        parser.add_argument("--mode", choices=["both", "per-task", "shared"], default="both", help="Client mode(s) to measure")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--iterations and --concurrency must be positive.")
+
+        modes = ["per-task", "shared"] if options["mode"] == "both" else [options["mode"]]
+        throughput = {}
+        for mode in modes:
+            reset_s3_client()
+            throughput[mode] = self.run(mode, options)
+
+        if len(throughput) == 2:
+            self.stdout.write(self.style.SUCCESS(f"Shared client: {throughput['shared'] / throughput['per-task']:.1f}x the per-task throughput."))
+
+    def run(self, mode, options):
+        def task_body(_):
+            # The part every bucket task repeats: get a client, then make one small request.
+            started = perf_counter()
+            connection = self.per_task_client() if mode == "per-task" else Bucket().connection
+            connection.list_objects_v2(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=options["prefix"], MaxKeys=1)
+            return (perf_counter() - started) * 1000
+
+        try:
+            started = perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                durations = list(executor.map(task_body, range(options["iterations"])))
+            elapsed = perf_counter() - started
+        except Exception as error:
+            raise CommandError(f"Error benchmarking the bucket in {mode} mode: {str(error)}")
+
+        p95 = quantiles(durations, n=100)[94] if len(durations) > 1 else durations[0]
+        self.stdout.write(
+            f"{mode}: {len(durations)} tasks in {elapsed:.2f} s ({len(durations) / elapsed:.1f} tasks/s), "
+            f"p50 {median(durations):.1f} ms, p95 {p95:.1f} ms"
+        )
+        return len(durations) / elapsed
+
+    def per_task_client(self):
+        # What Bucket() did before the client was shared: a new session, credentials and connection pool.
+        return boto3.session.Session().client(
+            service_name="s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            region_name=settings.AWS_S3_REGION_NAME,
+        )
+
+
+# ===================================================================
+
+# python manage.py benchmark_bucket
+# python manage.py benchmark_bucket --iterations 200 --concurrency 8 --prefix media/products/
@@ -0,0 +1,128 @@
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.conf import settings
+from itertools import islice
+from time import perf_counter
+import os
+import sqlite3
+from config.storages import Bucket, is_folder_marker
+
+
+# ========================= BaseCommand =============================
+
+class Command(BaseCommand):
+    help = "Mirrors the bucket into a local directory, transferring only objects changed since the last run"
+
+    manifest_name = ".manifest.sqlite3"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dest", required=True, help="Local mirror directory, outside the source tree; the manifest is kept inside it")
+        parser.add_argument("--prefix", default="", help="Only mirror keys starting with this prefix")
+        parser.add_argument("--workers", type=int, default=settings.BUCKET_DOWNLOAD_WORKERS, help="Objects transferred in parallel")
+        parser.add_argument("--delete", action="store_true", help="Remove local files whose keys are no longer in the bucket")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be transferred or removed")
+
+    def handle(self, *args, **options):
+        dest = os.path.abspath(options["dest"])
+        os.makedirs(dest, exist_ok=True)
+        bucket = Bucket()
+        stats = {"listed": 0, "changed": 0, "downloaded": 0, "skipped": 0, "failed": 0, "bytes": 0, "removed": 0}
+        started = perf_counter()
+
+        manifest = sqlite3.connect(os.path.join(dest, self.manifest_name))
+        try:
+            self.prepare(manifest)
+            for page in bucket.iter_files(options["prefix"], settings.BUCKET_LISTING_PAGE_SIZE):
+                stats["listed"] += len(page)
+                manifest.executemany("INSERT OR IGNORE INTO seen (key) VALUES (?)", [(file_info["Key"],) for file_info in page])
+                changed = self.diff(manifest, dest, page)
+                stats["changed"] += len(changed)
+                if options["dry_run"]:
+                    for file_info in changed:
+                        self.stdout.write(f"Would download {file_info['Key']} ({file_info['Size']} bytes)")
+                elif changed:
+                    self.transfer(manifest, bucket, dest, changed, options["workers"], stats)
+                # One transaction per page: an interrupted run resumes from the last page it committed.
+                manifest.commit()
+            if options["delete"]:
+                self.remove_deleted(manifest, dest, options["prefix"], options["dry_run"], stats)
+                manifest.commit()
+        except Exception as error:
+            raise CommandError(f"Error mirroring the bucket: {str(error)}")
+        finally:
+            manifest.close()
+
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f"{stats['listed']} objects listed, {stats['changed']} changed: {stats['downloaded']} downloaded, "
+            f"{stats['skipped']} already up to date, {stats['failed']} failed, {stats['removed']} removed."
+        )
+        self.stdout.write(
+            f"{stats['bytes'] / 1024 / 1024:.1f} MB in {elapsed:.1f} s "
+            f"({stats['bytes'] / 1024 / 1024 / elapsed:.2f} MB/s, {stats['listed'] / elapsed:.0f} objects/s checked)"
+        )
+        if stats["failed"]:
+            raise CommandError(f"{stats['failed']} objects could not be transferred; run the command again to retry them.")
+        self.stdout.write(self.style.SUCCESS(f"{'Dry run finished' if options['dry_run'] else 'Mirror is up to date'} in {dest}."))
+
+    def prepare(self, manifest):
+        manifest.execute(
+            "CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, size INTEGER NOT NULL, etag TEXT NOT NULL, last_modified TEXT) WITHOUT ROWID"
+        )
+        manifest.execute("CREATE TEMP TABLE seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def diff(self, manifest, dest, page, chunk_size=500):
+        """
+        Return the listed objects that differ from the manifest, or whose local file is missing.
+        Folder markers ("media/") are left out: they have no file to mirror.
+        """
+        page = [file_info for file_info in page if not is_folder_marker(file_info["Key"])]
+        known = {}
+        files = iter(page)
+        while chunk := list(islice(files, chunk_size)):
+            placeholders = ",".join("?" * len(chunk))
+            rows = manifest.execute(f"SELECT key, size, etag FROM objects WHERE key IN ({placeholders})", [file_info["Key"] for file_info in chunk])
+            known.update((key, (size, etag)) for key, size, etag in rows)
+        return [
+            file_info for file_info in page
+            if known.get(file_info["Key"]) != (file_info["Size"], file_info["ETag"]) or not os.path.exists(os.path.join(dest, file_info["Key"]))
+        ]
+
+    def transfer(self, manifest, bucket, dest, changed, workers, stats):
+        files = {file_info["Key"]: file_info for file_info in changed}
+        done = []
+        for result in bucket.download_files(changed, dest, workers):
+            if "error" in result:
+                stats["failed"] += 1
+                self.stderr.write(f"{result['key']}: {result['error']}")
+                continue
+            file_info = files[result["key"]]
+            if result["skipped"]:
+                stats["skipped"] += 1
+            else:
+                stats["downloaded"] += 1
+                stats["bytes"] += file_info["Size"]
+            done.append((file_info["Key"], file_info["Size"], file_info["ETag"], file_info["LastModified"]))
+        manifest.executemany("INSERT OR REPLACE INTO objects (key, size, etag, last_modified) VALUES (?, ?, ?, ?)", done)
+
+    def remove_deleted(self, manifest, dest, prefix, dry_run, stats):
+        deleted = [key for (key,) in manifest.execute(
+            "SELECT key FROM objects WHERE substr(key, 1, ?) = ? AND key NOT IN (SELECT key FROM seen)", [len(prefix), prefix]
+        )]
+        for key in deleted:
+            stats["removed"] += 1
+            if dry_run:
+                self.stdout.write(f"Would remove {key}")
+                continue
+            path = os.path.abspath(os.path.join(dest, key))
+            if os.path.commonpath([dest, path]) == dest and os.path.exists(path):
+                os.remove(path)
+        if not dry_run:
+            manifest.executemany("DELETE FROM objects WHERE key = ?", [(key,) for key in deleted])
+
+
+# ===================================================================
+
+# python manage.py mirror_bucket --dest /backups/media --dry-run
+# python manage.py mirror_bucket --dest /backups/media --workers 8 --delete
+# python manage.py mirror_bucket --dest /backups/media --prefix media/products/
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_remove_payment_is_sucessful_payment_is_paid_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_id'], name='users_payment_id_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -222,6 +222,7 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=["user"]),
             models.Index(fields=["payment_id"]),
+            models.Index(fields=["payment_id"], name="users_payment_id_like_idx", opclasses=["varchar_pattern_ops"]),
             models.Index(fields=["payment_date"]),
         ]
         
@@ -183,9 +183,9 @@ class BulkOperationSerializer(serializers.Serializer):
     """
     Serializer for bulk file operations on the ArvanCloud bucket.
     Used to validate a list of file keys for batch deletion.
-    - keys: Required. A list of file paths to be deleted from the bucket.
+    - keys: Required. A non-empty list of file paths to be deleted from the bucket.
     """
-    keys = serializers.ListField(child=serializers.CharField(max_length=500),required=True)
+    keys = serializers.ListField(child=serializers.CharField(max_length=500), required=True, allow_empty=False)
 
 
 # ====================================
@@ -4,7 +4,7 @@ from django.core.cache import cache
 import logging
 import time
 from .models import *
-from config.storages import Bucket 
+from config.storages import Bucket, BucketListing
 from utilities.utilities import *
 from utilities.custome_exception import CustomEmailException
 
@@ -73,33 +73,37 @@ def check_premium_subscriptions():
 #==================================== ArvanCloud Celery =================================================
 
 @shared_task(bind=True, max_retries=3)
-def fetch_all_files(self):
+def fetch_all_files(self, prefix="", page_size=None):
     """
-    Celery task to retrieve all files from the configured bucket.
-    This task initializes a `Bucket` instance and calls its `get_files()` method to fetch file metadata.
-    It logs the number of files retrieved and inspects the first three entries for debugging and visibility.
+    Celery task to list the files of the configured bucket, optionally under a key prefix.
+    The bucket is walked page by page with `Bucket.iter_files()`, following continuation tokens so listings
+    are never cut at 1000 keys. Every page is written to a `BucketListing` under this task's ID as soon as
+    it is listed, and served from there with cursor pagination by `BucketListingView`.
+    Parameters:
+        prefix (str, optional): Only keys starting with this prefix are listed.
+        page_size (int, optional): Keys per page, at most 1000; defaults to BUCKET_LISTING_PAGE_SIZE.
     Retries:
-        - Automatically retries up to 3 times on failure.
+        - Automatically retries up to 3 times on failure; a retry restarts the listing.
         - Waits 60 seconds between retries.
+        - When no retries are left, the listing is marked failed so `BucketListingView` stops answering 202.
     Returns:
-        List of file metadata dictionaries, or retries on failure.
+        The listing summary (listing_id, prefix, pages, count, complete) instead of the file list itself.
     """
+    listing = BucketListing(self.request.id)
     try:
-        logger.info("fetch_all_files task started")
+        logger.info(f"fetch_all_files task started for prefix {prefix!r}")
         bucket = Bucket()
-        logger.info("Bucket instance created")
-        
-        files = bucket.get_files()
-        logger.info(f"Fetched {len(files)} files from bucket")
-        
-        if files:
-            for i, file_info in enumerate(files[:3]):  
-                logger.info(f"File {i}: {file_info}")
-                for key, value in file_info.items():
-                    logger.info(f"  {key}: {value} (type: {type(value)})")
-        return files
+        listing.start(prefix)
+        for files in bucket.iter_files(prefix, page_size or settings.BUCKET_LISTING_PAGE_SIZE):
+            listing.add_page(files)
+        summary = listing.finish()
+        logger.info(f"Listed {summary['count']} files in {summary['pages']} pages from bucket")
+        return summary
     except Exception as error:
         logger.error(f"Failed to fetch files: {error}", exc_info=True)
+        if self.request.retries >= self.max_retries:
+            listing.fail(error)
+            raise
         self.retry(exc=error, countdown=60)
 
 
@@ -127,6 +131,31 @@ def remove_file(self, key):
         self.retry(exc=error, countdown=30)
 
 
+@shared_task(bind=True, max_retries=3)
+def remove_files(self, keys):
+    """
+    Celery task to delete many files from the bucket in one go.
+    This task initializes a `Bucket` instance and calls `delete_files(keys)`, which sends S3 `delete_objects`
+    requests of up to 1000 keys each instead of one `delete_object` (and one task) per key.
+    Parameters:
+        keys (list[str]): The keys of the files to delete.
+    Retries:
+        - Automatically retries up to 3 times when a whole request fails; per-key errors are reported, not retried.
+        - Waits 30 seconds between retries.
+    Returns:
+        Counts of deleted and failed keys, and the per-key results.
+    """
+    try:
+        bucket = Bucket()
+        results = bucket.delete_files(keys)
+        failed = sum(not result["deleted"] for result in results)
+        logger.info(f"Deleted {len(results) - failed} of {len(keys)} files")
+        return {"deleted": len(results) - failed, "failed": failed, "results": results}
+    except Exception as error:
+        logger.error(f"Failed to delete {len(keys)} files: {error}")
+        self.retry(exc=error, countdown=30)
+
+
 @shared_task(bind=True, max_retries=3)
 def download_obj(self, key, local_path=None):
     """
@@ -152,4 +181,32 @@ def download_obj(self, key, local_path=None):
         self.retry(exc=error, countdown=45)
 
 
+@shared_task(bind=True, max_retries=3)
+def download_objs(self, keys, local_dir=None):
+    """
+    Celery task to download many files from the bucket in one go.
+    This task initializes a `Bucket` instance and calls `download_files(keys, local_dir)`, which transfers the
+    objects over a thread pool with multipart ranged GETs, skips local copies whose ETag already matches and
+    moves each file into place atomically.
+    Parameters:
+        keys (list[str]): The keys of the files to download.
+        local_dir (str, optional): Destination directory; key paths are kept below it. Defaults to SHARED_DOWNLOADS_DIR.
+    Retries:
+        - Automatically retries up to 3 times on failure; per-key errors are reported, not retried.
+        - Waits 45 seconds between retries; files already downloaded are skipped on retry.
+    Returns:
+        Counts of downloaded, skipped and failed keys, and the per-key results.
+    """
+    try:
+        bucket = Bucket()
+        results = bucket.download_files(keys, local_dir)
+        failed = sum("error" in result for result in results)
+        skipped = sum(result.get("skipped", False) for result in results)
+        logger.info(f"Downloaded {len(results) - failed - skipped}, skipped {skipped} and failed {failed} of {len(keys)} files")
+        return {"downloaded": len(results) - failed - skipped, "skipped": skipped, "failed": failed, "results": results}
+    except Exception as error:
+        logger.error(f"Failed to download {len(keys)} files: {error}")
+        self.retry(exc=error, countdown=45)
+
+
 #========================================================================================================
\ No newline at end of file
@@ -11,14 +11,24 @@ from django.urls import resolve, reverse
 from django.core import mail
 from unittest.mock import patch
 from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from io import StringIO
 from urllib.parse import urlencode
 import json
+import tempfile
+import shutil
+import hashlib
 from .models import *
 from .serializers import *
 from .views import *
 from .urls import *
 from utilities.users_constant import primary_user_1, primary_user_2, primary_user_3, primary_user_4, new_user_1, invalid_user_1
 from utilities.utilities import create_test_users
+from config.storages import Bucket, BucketListing, ArvanCloudStorage, reset_s3_client, local_etag_matches
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from .tasks import fetch_all_files, remove_files, download_objs
+from utilities.custom_async import TaskResult
 
 
 #======================================== Sign Up Test =============================================
@@ -410,5 +420,312 @@ class FetchUsersTest(APITestCase):
         view = resolve("/users/fetch-users/")
         self.assertEqual(view.func.cls, FetchUsersModelViewSet)
         
+
+#======================================== Fake Bucket ==============================================
+
+class FakeBucketMixin:
+    """
+    Replaces the shared S3 client with an in-memory bucket for the tests of a class.
+
+    Attributes:
+        objects: Contents of the fake bucket (key -> bytes); tests may change it between calls.
+        failing: Keys that `delete_objects` refuses to delete.
+        connection: The mock client; its S3 calls are answered from `objects`.
+
+    Methods:
+        start_fake_bucket: Patches `get_s3_client` for the duration of the test.
+        list_objects_v2: Pages `objects` like S3 does, at most 1000 keys per call, with continuation tokens.
+    """
+    def start_fake_bucket(self, objects, failing=()):
+        self.objects, self.failing = objects, set(failing)
+        patcher = patch("config.storages.get_s3_client")
+        self.connection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.connection.list_objects_v2.side_effect = self.list_objects_v2
+        self.connection.head_object.side_effect = lambda Bucket, Key: {"ETag": self.etag(Key)}
+        self.connection.download_fileobj.side_effect = lambda Bucket, Key, file, Config: file.write(self.objects[Key])
+        self.connection.delete_objects.side_effect = self.delete_objects
+
+    def etag(self, key):
+        return f'"{hashlib.md5(self.objects[key]).hexdigest()}"'
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        end = start + min(MaxKeys, 1000)
+        res = {"Contents": [{"Key": key, "Size": len(self.objects[key]), "ETag": self.etag(key)} for key in keys[start:end]], "IsTruncated": end < len(keys)}
+        if res["IsTruncated"]:
+            res["NextContinuationToken"] = str(end)
+        return res
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        return {
+            "Deleted": [{"Key": key} for key in keys if key not in self.failing],
+            "Errors": [{"Key": key, "Code": "AccessDenied", "Message": "Access Denied"} for key in keys if key in self.failing],
+        }
+
+
+#======================================== Bucket Listing Test ======================================
+
+@override_settings(BUCKET_LISTING_PAGE_SIZE=2)
+class BucketListingTest(FakeBucketMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user_1, self.user_2, self.user_3, self.user_4 = create_test_users()
+        self.client.force_authenticate(self.user_1)
+        self.keys = [f"media/products/{i}.jpg" for i in range(5)] + ["media/users/1.jpg"]
+        self.start_fake_bucket(dict.fromkeys(self.keys, b"file"))
+        self.addCleanup(cache.clear)
+
+    def test_iter_files_follows_continuation_tokens(self):
+        self.objects.update((f"media/{i:04}.jpg", b"file") for i in range(2394))
+        bucket = Bucket()
+        pages = list(bucket.iter_files())
+        self.assertEqual([len(page) for page in pages], [1000, 1000, 400])
+        self.assertEqual(len(bucket.get_files()), 2400)
+
+    def test_listing_served_page_by_page(self):
+        response = self.client.get(reverse("bucket-files"), {"prefix": "media/products/"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(BucketListing(response.data["task_id"]).get_summary()["pages"], 3)
+        keys, url = [], response.data["files_url"]
+        while url:
+            page = self.client.get(url)
+            self.assertEqual(page.status_code, status.HTTP_200_OK)
+            self.assertTrue(page.data["complete"])
+            self.assertEqual(page.data["count"], 5)
+            keys += [file_info["Key"] for file_info in page.data["files"]]
+            url = page.data["next"]
+        self.assertEqual(keys, self.keys[:5])
+        self.assertIsNotNone(page.data["previous"])
+
+    def test_listing_pages_readable_before_completion(self):
+        listing = BucketListing("listing-in-progress")
+        listing.start()
+        listing.add_page([Bucket.file_info({"Key": "a.jpg", "Size": 1, "ETag": '"a"'})])
+        url = reverse("bucket-listing", kwargs={"listing_id": "listing-in-progress"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["complete"])
+        self.assertIsNotNone(response.data["next"])
+        self.assertEqual(self.client.get(response.data["next"]).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get(url, {"cursor": "x"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retry_drops_pages_of_previous_attempt(self):
+        listing = BucketListing("retried-listing")
+        listing.start()
+        for number in range(3):
+            listing.add_page([Bucket.file_info({"Key": f"{number}.jpg", "Size": 1, "ETag": '"a"'})])
+        url = reverse("bucket-listing", kwargs={"listing_id": "retried-listing"})
+        stale_next = self.client.get(url).data["next"]
+
+        retry = BucketListing("retried-listing")
+        retry.start()
+        retry.add_page([Bucket.file_info({"Key": "0.jpg", "Size": 1, "ETag": '"a"'})])
+        retry.finish()
+        self.assertIsNone(retry.get_page(1, 2))
+        self.assertEqual(self.client.get(stale_next).status_code, status.HTTP_410_GONE)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["files"]), 1)
+        self.assertIsNone(response.data["next"])
+
+    def test_failed_listing_stops_polling(self):
+        self.connection.list_objects_v2.side_effect = ClientError({"Error": {"Code": "500", "Message": "Internal"}}, "ListObjectsV2")
+        result = fetch_all_files.apply(args=["media/"], task_id="failed-listing")
+        self.assertEqual(result.state, "FAILURE")
+        self.assertEqual(self.connection.list_objects_v2.call_count, fetch_all_files.max_retries + 1)
+        response = self.client.get(reverse("bucket-listing", kwargs={"listing_id": "failed-listing"}))
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn("Internal", response.data["details"])
+
+    def test_unknown_listing(self):
+        response = self.client.get(reverse("bucket-listing", kwargs={"listing_id": "missing"}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+#======================================== Shared S3 Client Test ====================================
+
+class SharedS3ClientTest(APITestCase):
+    def setUp(self):
+        reset_s3_client()
+        self.addCleanup(reset_s3_client)
+
+    def test_bucket_and_storage_share_one_client(self):
+        client = Bucket().connection
+        self.assertIs(Bucket().connection, client)
+        self.assertIs(ArvanCloudStorage().connection.meta.client, client)
+        self.assertIs(ArvanCloudStorage().bucket.meta.client, client)
+        self.assertEqual(client.meta.config.max_pool_connections, settings.AWS_S3_MAX_POOL_CONNECTIONS)
+
+    @override_settings(AWS_S3_SIGNATURE_VERSION="s3v4", AWS_S3_ADDRESSING_STYLE="path")
+    def test_shared_client_uses_storage_client_config(self):
+        config = ArvanCloudStorage().connection.meta.client.meta.config
+        self.assertEqual((config.signature_version, config.s3["addressing_style"]), ("s3v4", "path"))
+        self.assertEqual(config.max_pool_connections, settings.AWS_S3_MAX_POOL_CONNECTIONS)
+        self.assertIs(Bucket().connection, ArvanCloudStorage().connection.meta.client)
+
+    def test_storages_with_other_options_get_their_own_client(self):
+        other = ArvanCloudStorage(endpoint_url="https://s3.example.com")
+        self.assertIsNot(other.connection.meta.client, Bucket().connection)
+        self.assertEqual(other.connection.meta.client.meta.endpoint_url, "https://s3.example.com")
+
+    def test_client_recreated_after_reset(self):
+        storage = ArvanCloudStorage()
+        client = storage.connection.meta.client
+        reset_s3_client()  # what a forked child runs
+        self.assertIsNot(Bucket().connection, client)
+        self.assertIs(storage.connection.meta.client, Bucket().connection)
+        self.assertIs(storage.bucket.meta.client, Bucket().connection)
+
+
+#======================================== Bulk Delete Test =========================================
+
+class BulkDeleteTest(FakeBucketMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("bulk-delete")
+        self.user_1, self.user_2, self.user_3, self.user_4 = create_test_users()
+        self.client.force_authenticate(self.user_1)
+        self.start_fake_bucket({}, failing={"media/locked.jpg"})
+
+    def test_bulk_delete_sends_one_task_and_one_request(self):
+        keys = ["media/a.jpg", "media/b.jpg", "media/locked.jpg"]
+        with patch("users.views.remove_file.delay") as remove_file:
+            response = self.client.post(self.url, {"keys": keys}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIn("status_url", response.data)
+        self.assertEqual(response.data["total_files"], 3)
+        remove_file.assert_not_called()
+        self.connection.delete_objects.assert_called_once()
+
+    def test_bulk_delete_reports_each_key(self):
+        result = remove_files.apply(args=[["media/a.jpg", "media/locked.jpg"]]).result
+        self.assertEqual((result["deleted"], result["failed"]), (1, 1))
+        self.assertEqual(result["results"][0], {"key": "media/a.jpg", "deleted": True})
+        self.assertFalse(result["results"][1]["deleted"])
+        self.assertIn("AccessDenied", result["results"][1]["error"])
+
+    def test_bulk_delete_batches_of_1000(self):
+        results = Bucket().delete_files([f"media/{i}.jpg" for i in range(2500)])
+        self.assertEqual(len(results), 2500)
+        self.assertEqual([len(call.kwargs["Delete"]["Objects"]) for call in self.connection.delete_objects.call_args_list], [1000, 1000, 500])
+
+    def test_bulk_delete_result_reflects_failures(self):
+        view = BulkDeleteResultView()
+        view.request = None
+        cases = [({"deleted": 2, "failed": 0}, status.HTTP_200_OK), ({"deleted": 1, "failed": 1}, status.HTTP_207_MULTI_STATUS), ({"deleted": 0, "failed": 2}, status.HTTP_500_INTERNAL_SERVER_ERROR)]
+        for summary, expected in cases:
+            result = TaskResult("task", {"status": "SUCCESS", "result": {**summary, "results": []}})
+            self.assertEqual(view.build_response("task", result).status_code, expected)
+
+    def test_bulk_delete_rejects_empty_keys(self):
+        response = self.client.post(self.url, {"keys": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_limit(self):
+        response = self.client.post(self.url, {"keys": [f"media/{i}.jpg" for i in range(1001)]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.connection.delete_objects.assert_not_called()
+
+
+#======================================== Bulk Download Test =======================================
+
+class BulkDownloadTest(FakeBucketMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user_1, self.user_2, self.user_3, self.user_4 = create_test_users()
+        self.client.force_authenticate(self.user_1)
+        self.local_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.local_dir)
+        self.start_fake_bucket({"media/products/1.jpg": b"first", "media/users/1.jpg": b"second"})
+
+    def test_batch_download_keeps_key_paths_and_skips_unchanged(self):
+        result = download_objs.apply(args=[list(self.objects), self.local_dir]).result
+        self.assertEqual((result["downloaded"], result["skipped"], result["failed"]), (2, 0, 0))
+        for key, content in self.objects.items():
+            with open(os.path.join(self.local_dir, key), "rb") as file:
+                self.assertEqual(file.read(), content)
+        self.assertFalse([name for _, _, names in os.walk(self.local_dir) for name in names if name.endswith(".part")])
+
+        self.objects["media/users/1.jpg"] = b"changed"
+        result = download_objs.apply(args=[list(self.objects), self.local_dir]).result
+        self.assertEqual((result["downloaded"], result["skipped"]), (1, 1))
+        self.assertEqual(self.connection.download_fileobj.call_count, 3)
+
+    def test_failed_download_leaves_no_partial_file(self):
+        self.connection.download_fileobj.side_effect = ClientError({"Error": {"Code": "500", "Message": "Internal"}}, "GetObject")
+        result = download_objs.apply(args=[["media/products/1.jpg", "../outside.jpg"], self.local_dir]).result
+        self.assertEqual(result["failed"], 2)
+        self.assertEqual([name for _, _, names in os.walk(self.local_dir) for name in names], [])
+
+    def test_folder_markers_skipped(self):
+        self.objects["media/"] = b""
+        for keys in (["media/", *self.objects], [*self.objects, "media/"]):
+            result = download_objs.apply(args=[list(dict.fromkeys(keys)), self.local_dir]).result
+            self.assertEqual(result["failed"], 0)
+            self.assertTrue(os.path.isdir(os.path.join(self.local_dir, "media")))
+
+    @override_settings(AWS_S3_TRANSFER_CONFIG=TransferConfig(multipart_chunksize=4))
+    def test_multipart_etag_match(self):
+        path = os.path.join(self.local_dir, "file")
+        with open(path, "wb") as file:
+            file.write(b"abcdefghij")
+        parts = [hashlib.md5(part).digest() for part in (b"abcd", b"efgh", b"ij")]
+        self.assertTrue(local_etag_matches(path, f'"{hashlib.md5(b"".join(parts)).hexdigest()}-3"'))
+        self.assertFalse(local_etag_matches(path, f'"{hashlib.md5(b"".join(parts)).hexdigest()}-2"'))
+
+    def test_bulk_download_view(self):
+        with override_settings(SHARED_DOWNLOADS_DIR=self.local_dir):
+            response = self.client.post(reverse("bulk-download"), {"keys": list(self.objects)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIn("status_url", response.data)
+        self.assertTrue(os.path.exists(os.path.join(self.local_dir, "media/products/1.jpg")))
+
+
+#======================================== Mirror Bucket Test =======================================
+
+@override_settings(BUCKET_LISTING_PAGE_SIZE=2)
+class MirrorBucketTest(FakeBucketMixin, APITestCase):
+    def setUp(self):
+        self.dest = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dest)
+        self.start_fake_bucket({"media/products/1.jpg": b"first", "media/products/2.jpg": b"second", "media/users/1.jpg": b"third"})
+
+    def mirror(self, *args):
+        call_command("mirror_bucket", "--dest", self.dest, *args, stdout=StringIO(), stderr=StringIO())
+        return self.connection.download_fileobj.call_count
+
+    def test_mirror_transfers_only_changes(self):
+        self.assertEqual(self.mirror(), 3)
+        self.assertEqual(self.mirror(), 3)
+
+        self.objects["media/products/1.jpg"] = b"changed"
+        del self.objects["media/users/1.jpg"]
+        self.assertEqual(self.mirror("--delete"), 4)
+        with open(os.path.join(self.dest, "media/products/1.jpg"), "rb") as file:
+            self.assertEqual(file.read(), b"changed")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "media/users/1.jpg")))
+
+    def test_mirror_rebuilds_lost_manifest_without_transfers(self):
+        self.mirror()
+        os.remove(os.path.join(self.dest, ".manifest.sqlite3"))
+        self.assertEqual(self.mirror(), 3)
+
+    def test_mirror_with_folder_markers(self):
+        self.objects.update({"media/": b"", "media/products/": b""})
+        self.assertEqual(self.mirror(), 3)
+        self.assertEqual(self.mirror(), 3)
+        self.assertTrue(os.path.isdir(os.path.join(self.dest, "media/products")))
+
+    def test_dest_required(self):
+        with self.assertRaises(CommandError):
+            call_command("mirror_bucket", stdout=StringIO(), stderr=StringIO())
+
+    def test_dry_run_and_prefix(self):
+        self.assertEqual(self.mirror("--dry-run"), 0)
+        self.assertEqual(self.mirror("--prefix", "media/users/"), 1)
+        self.assertEqual(os.listdir(os.path.join(self.dest, "media")), ["users"])
+        
         
 #===================================================================================================
\ No newline at end of file
@@ -1,10 +1,12 @@
 from django.urls import path, re_path, include
+from django.conf import settings
 from rest_framework.routers import DefaultRouter
 from .views import (
     SignUpAPIView, VerifyEmailAPIView, LoginAPIView, UserProfileAPIView, 
     PartialUserUpdateAPIView, FetchUsersModelViewSet, PasswordResetAPIView, SetNewPasswordAPIView,
-    BucketFilesView, BucketResultView, FileDeleteView, BulkDeleteView, FileDeleteResultView, 
-    FileDownloadView, FileDownloadResultView, RequestEmailChangeAPIView, 
+    BucketFilesView, BucketResultView, BucketListingView, FileDeleteView, BulkDeleteView, BulkDeleteResultView, FileDeleteResultView, 
+    FileDownloadView, FileDownloadResultView, BulkDownloadView, BulkDownloadResultView, RequestEmailChangeAPIView, 
+    AsyncBucketResultView, AsyncFileDeleteResultView, AsyncBulkDeleteResultView, AsyncFileDownloadResultView, AsyncBulkDownloadResultView, TaskEventsView,
 )
 
 router = DefaultRouter()
@@ -24,11 +26,28 @@ urlpatterns = [
     # ArvanCloud
     path("admin/bucket/files/", BucketFilesView.as_view(), name="bucket-files"),
     path("admin/bucket/result/<str:task_id>/", BucketResultView.as_view(), name="bucket-files-result"),
+    path("admin/bucket/files/<str:listing_id>/", BucketListingView.as_view(), name="bucket-listing"),
     path("admin/bucket/delete/", FileDeleteView.as_view(), name="file-delete"),
     path("admin/bucket/delete/bulk/", BulkDeleteView.as_view(), name="bulk-delete"),
+    path("admin/bucket/delete/bulk/result/<str:task_id>/", BulkDeleteResultView.as_view(), name="bulk-delete-result"),
     path("admin/bucket/delete/result/<str:task_id>/", FileDeleteResultView.as_view(), name="file-delete-result"),
     path("admin/bucket/download/", FileDownloadView.as_view(), name="file-download"),
+    path("admin/bucket/download/bulk/", BulkDownloadView.as_view(), name="bulk-download"),
+    path("admin/bucket/download/bulk/result/<str:task_id>/", BulkDownloadResultView.as_view(), name="bulk-download-result"),
     path("admin/bucket/download/<str:task_id>/", FileDownloadResultView.as_view(), name="file-download-result"),
 ]   
 
+# ASGI profile: task polling is served by async views placed ahead of their sync counterparts.
+async_urlpatterns = [
+    path("admin/bucket/result/<str:task_id>/", AsyncBucketResultView.as_view()),
+    path("admin/bucket/delete/result/<str:task_id>/", AsyncFileDeleteResultView.as_view()),
+    path("admin/bucket/delete/bulk/result/<str:task_id>/", AsyncBulkDeleteResultView.as_view()),
+    path("admin/bucket/download/bulk/result/<str:task_id>/", AsyncBulkDownloadResultView.as_view()),
+    path("admin/bucket/download/<str:task_id>/", AsyncFileDownloadResultView.as_view()),
+    path("admin/tasks/events/", TaskEventsView.as_view(), name="task-events"),
+]
+
+if settings.ASGI_MODE:
+    urlpatterns = async_urlpatterns + urlpatterns
+
 urlpatterns += router.urls
\ No newline at end of file
@@ -10,8 +10,10 @@ from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from django.contrib.auth import authenticate
 from django.core.cache import cache
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.conf import settings
 from celery.result import AsyncResult
+from asgiref.sync import sync_to_async
 from logging import getLogger
 from django.urls import reverse
 from urllib.parse import urlencode
@@ -21,9 +23,11 @@ import json
 import uuid
 from .models import *
 from .serializers import *
-from .tasks import fetch_all_files, remove_file, download_obj
+from .tasks import fetch_all_files, remove_file, remove_files, download_obj, download_objs
+from config.storages import BucketListing
 from utilities.utilities import email_sender, generate_access_token, generate_auth_tokens
 from utilities.custom_permission import CheckOwnershipPermission
+from utilities.custom_async import AsyncAPIView, aget_task_result, await_task_results
 from utilities.custome_throttling import CustomThrottle
 from utilities.custome_exception import CustomEmailException, CustomRedisException
 
@@ -578,16 +582,20 @@ class BucketFilesView(APIView):
         },
         summary="Admin-only API view to trigger async file listing from ArvanCloud bucket.",
         description=(
-            "Initiates a Celery task to asynchronously list all files stored in the ArvanCloud bucket. "
+            "Initiates a Celery task to asynchronously list all files stored in the ArvanCloud bucket, optionally under a key prefix. "
             "Only accessible to admin users. "
-            "Returns immediately with a task ID and a polling URL to check task status and retrieve results once available.",
+            "Returns immediately with a task ID, a polling URL for the task status and a URL serving the listed files page by page.",
         ),
+        parameters=[
+            OpenApiParameter(name="prefix", type=OpenApiTypes.STR, required=False, description="Only list keys starting with this prefix.")
+        ]
     )
         
     def get(self, request):
-        logger.info("[BucketFilesView] Starting fetch_all_files task")
+        prefix = request.query_params.get("prefix", "")
+        logger.info(f"[BucketFilesView] Starting fetch_all_files task for prefix {prefix!r}")
         try:
-            task = fetch_all_files.apply_async()  
+            task = fetch_all_files.apply_async(kwargs={"prefix": prefix})  
             logger.info(f"[BucketFilesView] Task sent to Celery with ID: {task.id}")
             return Response({
                 "task_id": task.id,
@@ -595,6 +603,9 @@ class BucketFilesView(APIView):
                 "message": "File listing task started. Use task ID to check results.",
                 "check_url": request.build_absolute_uri(
                 reverse("bucket-files-result", kwargs={"task_id": task.id})
+            ),
+                "files_url": request.build_absolute_uri(
+                reverse("bucket-listing", kwargs={"listing_id": task.id})
             ) 
             }, status=status.HTTP_202_ACCEPTED)
         except Exception as error:
@@ -614,7 +625,7 @@ class BucketResultView(APIView):
     @extend_schema(
         request=None,
         responses={
-            200: "Task completed successfully; file list returned",
+            200: "Task completed successfully; listing summary and files URL returned",
             202: "Task still processing; retry suggested",
             400: "Missing or invalid task ID",
             500: "Task failed or result serialization error"
@@ -622,7 +633,7 @@ class BucketResultView(APIView):
         summary="Admin-only API view to poll results of async file listing task.",
         description=(
             "Checks the status and result of a previously triggered asynchronous file listing task in ArvanCloud. "
-            "Accepts a task ID and returns one of the following: the completed file list, a pending status with retry suggestion, "
+            "Accepts a task ID and returns one of the following: the listing summary with the URL of its first page, a pending status with retry suggestion, "
             "or error details if the task failed or result format is invalid. "
             "Only accessible to admin users."
         ),
@@ -632,25 +643,27 @@ class BucketResultView(APIView):
     )
 
     def get(self, request, task_id):
-        task_id = str(task_id)
-        
+        return self.build_response(str(task_id), AsyncResult(str(task_id)))
+    
+    def build_response(self, task_id, result):
         if not task_id: 
             return Response({"error": "Task ID is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-        result = AsyncResult(task_id)
         
         logger.info(f"[BucketResultView] Checking task result: {task_id}")
         
         if result.ready():
             if result.successful():
                 try:
-                    serializer = FileInfoSerializer(result.result, many=True)
                     logger.info(f"[BucketResultView] Task {task_id} completed successfully.")
                     return Response({
                         "status": "SUCCESS",
                         "task_id": task_id,
-                        "files": serializer.data,
-                        "count": len(result.result)
+                        "count": result.result["count"],
+                        "pages": result.result["pages"],
+                        "prefix": result.result["prefix"],
+                        "files_url": self.request.build_absolute_uri(
+                            reverse("bucket-listing", kwargs={"listing_id": task_id})
+                        )
                     }, status=status.HTTP_200_OK)
                     
                 except Exception as error:
@@ -680,6 +693,85 @@ class BucketResultView(APIView):
         }, status=status.HTTP_202_ACCEPTED)
 
 
+# ====================================
+
+class BucketListingView(APIView):
+    
+    permission_classes = [IsAdminUser]
+    cursor_query_param = "cursor"
+    
+    @extend_schema(
+        request=None,
+        responses={
+            200: "One page of the listing with next and previous links",
+            202: "Page not listed yet; retry suggested",
+            400: "Invalid cursor",
+            404: "Listing not found or expired",
+            410: "The listing was restarted by a retry; the cursor belongs to the previous run",
+            500: "The listing task failed after all its retries"
+        },
+        summary="Admin-only API view to read a bucket listing page by page.",
+        description=(
+            "Serves the files stored by a file listing task one page at a time, following continuation order. "
+            "Pages become readable as soon as they are listed, before the task completes; "
+            "clients keep following the 'next' link until it is null and 'complete' is true. "
+            "Only accessible to admin users."
+        ),
+        parameters=[
+            OpenApiParameter(name="listing_id", type=OpenApiTypes.STR, location=OpenApiParameter.PATH, description="Task ID of the file listing task."),
+            OpenApiParameter(name="cursor", type=OpenApiTypes.STR, required=False, description="Cursor taken from the 'next' or 'previous' link of a page.")
+        ]
+    )
+
+    def get(self, request, listing_id):
+        listing = BucketListing(listing_id)
+        summary = listing.get_summary()
+        if summary is None:
+            return Response({"error": "Listing not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+        if summary.get("failed"):
+            return Response({
+                "error": "Listing failed",
+                "listing_id": summary["listing_id"],
+                "details": summary["error"]
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            attempt, number = listing.decode_cursor(cursor) if cursor else (summary["attempt"], 0)
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        if attempt != summary["attempt"]:
+            return Response({
+                "error": "The listing was restarted; start again from the first page",
+                "first_url": request.build_absolute_uri(request.path)
+            }, status=status.HTTP_410_GONE)
+        
+        files = listing.get_page(attempt, number)
+        if files is None:
+            if summary["complete"]:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                "status": "PENDING",
+                "listing_id": summary["listing_id"],
+                "message": "This page is still being listed. Please check back later.",
+                "suggested_retry": 2000
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        has_next = number + 1 < summary["pages"] or not summary["complete"]
+        return Response({
+            "listing_id": summary["listing_id"],
+            "prefix": summary["prefix"],
+            "complete": summary["complete"],
+            "count": summary["count"],
+            "next": self.get_page_link(listing.encode_cursor(attempt, number + 1)) if has_next else None,
+            "previous": self.get_page_link(listing.encode_cursor(attempt, number - 1)) if number > 0 else None,
+            "files": FileInfoSerializer(files, many=True).data
+        }, status=status.HTTP_200_OK)
+    
+    def get_page_link(self, cursor):
+        return self.request.build_absolute_uri(f"{self.request.path}?{urlencode({self.cursor_query_param: cursor})}")
+
+
 # ====================================
 
 class FileDeleteView(APIView):
@@ -723,16 +815,18 @@ class BulkDeleteView(APIView):
     
     permission_classes = [IsAdminUser]
     
+    max_keys = 1000
+    
     @extend_schema(
         request=BulkOperationSerializer,
         responses={
-            202: "Bulk delete tasks started successfully; task IDs returned",
+            202: "Bulk delete task started successfully; task ID returned",
             400: "Invalid input or too many files"
         },
         summary="Admin-only API view to delete multiple files from the bucket.",
         description=(
-            "Initiates asynchronous deletion tasks for up to 100 files in a single request. "
-            "Accepts a list of file keys and returns a list of task IDs and polling URLs for each file deletion operation."
+            "Initiates one asynchronous deletion task for up to 1000 files, sent to the bucket as a single batch delete request. "
+            "Accepts a list of file keys and returns one task ID and polling URL; the task result reports success or failure per key."
         )
     )
 
@@ -741,30 +835,26 @@ class BulkDeleteView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        keys = serializer.validated_data["keys"]
+        keys = list(dict.fromkeys(serializer.validated_data["keys"]))
         
-        if len(keys) > 100: 
+        if len(keys) > self.max_keys: 
             return Response(
-                {"error": "Maximum 100 files allowed in bulk operation"},
+                {"error": f"Maximum {self.max_keys} files allowed in bulk operation"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        task_ids = []
-        for key in keys:
-            task = remove_file.delay(key)
-            task_ids.append({
-                "key": key,
-                "task_id": task.id,
-                "status_url": request.build_absolute_uri(
-                    reverse("file-delete-result", kwargs={"task_id": task.id})
-                )
-            })
-        
-        return Response({
-            "operations": task_ids,
+        task = remove_files.delay(keys)
+        data = {
+            "task_id": task.id,
+            "status_url": request.build_absolute_uri(
+                reverse("bulk-delete-result", kwargs={"task_id": task.id})
+            ),
             "total_files": len(keys),
             "message": f"Started deletion of {len(keys)} files"
-        }, status=status.HTTP_202_ACCEPTED)
+        }
+        if settings.ASGI_MODE:
+            data["events_url"] = request.build_absolute_uri(f"{reverse('task-events')}?{urlencode({'task_id': task.id})}")
+        return Response(data, status=status.HTTP_202_ACCEPTED)
 
 
 # ====================================
@@ -791,9 +881,9 @@ class FileDeleteResultView(APIView):
     )
     
     def get(self, request, task_id):
-        task_id = str(task_id)
-        result = AsyncResult(task_id)
-        
+        return self.build_response(str(task_id), AsyncResult(str(task_id)))
+    
+    def build_response(self, task_id, result):
         logger.info(f"[FileDeleteResultView] Checking task result: {task_id}")
         
         if result.ready():
@@ -823,6 +913,65 @@ class FileDeleteResultView(APIView):
         }, status=status.HTTP_202_ACCEPTED)
 
 
+# ====================================
+
+class BulkDeleteResultView(APIView):
+    
+    permission_classes = [IsAdminUser]
+    
+    @extend_schema(
+        request=None,
+        responses={
+            200: "Every file deleted; per-key results returned",
+            202: "Bulk delete task still processing",
+            207: "Some files could not be deleted; per-key results returned",
+            500: "Task failed or no file could be deleted"
+        },
+        summary="Admin-only API view to check the result of a bulk delete task.",
+        description=(
+            "Polls the status of a previously triggered bulk delete task using its task ID. "
+            "Once the task is done, returns the deleted and failed counts with the outcome of every key; "
+            "the status reflects whether all, some or none of the files were deleted."
+        ),
+        parameters=[
+            OpenApiParameter(name="task_id", type=OpenApiTypes.STR, required=True, description="Unique ID of the Celery task to poll for the bulk delete result.")
+        ]
+    )
+    
+    def get(self, request, task_id):
+        return self.build_response(str(task_id), AsyncResult(str(task_id)))
+    
+    def build_response(self, task_id, result):
+        if result.ready():
+            if result.successful():
+                summary = result.result
+                if not summary["failed"]:
+                    state, message, code = "SUCCESS", "All files deleted successfully", status.HTTP_200_OK
+                elif summary["deleted"]:
+                    state, message, code = "PARTIAL", f"{summary['failed']} files could not be deleted", status.HTTP_207_MULTI_STATUS
+                else:
+                    state, message, code = "FAILURE", "No file could be deleted", status.HTTP_500_INTERNAL_SERVER_ERROR
+                return Response({
+                    "status": state,
+                    "task_id": task_id,
+                    "message": message,
+                    "result": summary
+                }, status=code)
+            logger.error(f"[BulkDeleteResultView] Task {task_id} failed: {result.result}")
+            return Response({
+                "status": "FAILURE",
+                "task_id": task_id,
+                "error": str(result.result),
+                "traceback": result.traceback
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            "status": "PENDING",
+            "task_id": task_id,
+            "message": "Delete operation still in progress"
+        }, status=status.HTTP_202_ACCEPTED)
+
+
 # ====================================
 
 class FileDownloadView(APIView):
@@ -852,7 +1001,7 @@ class FileDownloadView(APIView):
         
         if not local_path:
             filename = os.path.basename(key)
-            local_path = os.path.join("/app/shared_downloads/", filename)
+            local_path = os.path.join(settings.SHARED_DOWNLOADS_DIR, filename)
         elif local_path.endswith("/"):
             filename = os.path.basename(key)
             local_path = os.path.join(local_path, filename)
@@ -895,8 +1044,9 @@ class FileDownloadResultView(APIView):
     )
 
     def get(self, request, task_id):
-        result = AsyncResult(str(task_id))  
-        
+        return self.build_response(str(task_id), AsyncResult(str(task_id)))
+    
+    def build_response(self, task_id, result):
         if result.ready():
             if result.successful():
                 file_path = result.result
@@ -933,6 +1083,199 @@ class FileDownloadResultView(APIView):
             "status": "PENDING",
             "message": "Download still in progress"
         }, status=status.HTTP_202_ACCEPTED)
+
+
+# ====================================
+
+class BulkDownloadView(APIView):
+    
+    permission_classes = [IsAdminUser]
+    max_keys = 1000
+    
+    @extend_schema(
+        request=BulkOperationSerializer,
+        responses={
+            202: "Bulk download task started successfully; task ID returned",
+            400: "Invalid input or too many files"
+        },
+        summary="Admin-only API view to download multiple files from the bucket to the shared downloads directory.",
+        description=(
+            "Initiates one asynchronous task that downloads up to 1000 files in parallel into the shared downloads directory, keeping their key paths. "
+            "Files whose local copy already matches the bucket ETag are skipped. "
+            "Returns one task ID and polling URL; the task result reports the outcome per key."
+        )
+    )
+
+    def post(self, request):
+        serializer = BulkOperationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        keys = list(dict.fromkeys(serializer.validated_data["keys"]))
+        
+        if len(keys) > self.max_keys: 
+            return Response(
+                {"error": f"Maximum {self.max_keys} files allowed in bulk operation"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        task = download_objs.delay(keys)
+        data = {
+            "task_id": task.id,
+            "status_url": request.build_absolute_uri(
+                reverse("bulk-download-result", kwargs={"task_id": task.id})
+            ),
+            "total_files": len(keys),
+            "message": f"Started download of {len(keys)} files"
+        }
+        if settings.ASGI_MODE:
+            data["events_url"] = request.build_absolute_uri(f"{reverse('task-events')}?{urlencode({'task_id': task.id})}")
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+# ====================================
+
+class BulkDownloadResultView(APIView):
+    
+    permission_classes = [IsAdminUser]
+    
+    @extend_schema(
+        request=None,
+        responses={
+            200: "Bulk download finished; per-key results returned",
+            202: "Bulk download task still processing",
+            500: "Task failed or encountered an error"
+        },
+        summary="Admin-only API view to check the result of a bulk download task.",
+        description=(
+            "Polls the status of a previously triggered bulk download task using its task ID. "
+            "Returns the downloaded, skipped and failed counts with the local path or error of every key once the task is done."
+        ),
+        parameters=[
+            OpenApiParameter(name="task_id", type=OpenApiTypes.STR, required=True, description="Unique ID of the Celery task to poll for the bulk download result.")
+        ]
+    )
+    
+    def get(self, request, task_id):
+        return self.build_response(str(task_id), AsyncResult(str(task_id)))
+    
+    def build_response(self, task_id, result):
+        if result.ready():
+            if result.successful():
+                return Response({
+                    "status": "SUCCESS",
+                    "task_id": task_id,
+                    "result": result.result
+                }, status=status.HTTP_200_OK)
+            logger.error(f"[BulkDownloadResultView] Task {task_id} failed: {result.result}")
+            return Response({
+                "status": "FAILURE",
+                "task_id": task_id,
+                "error": str(result.result),
+                "traceback": result.traceback
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            "status": "PENDING",
+            "task_id": task_id,
+            "message": "Download still in progress"
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+# ====================================
+# ASGI profile: the polling views read the result backend with one async Redis GET instead of a blocking AsyncResult.
+# With `?wait=<seconds>` they long-poll: the request is held until the task finishes or the wait runs out.
+
+def get_wait_seconds(request):
+    try:
+        return min(max(float(request.query_params.get("wait", 0)), 0), settings.TASK_RESULT_MAX_WAIT)
+    except ValueError:
+        return 0
+
+
+class AsyncBucketResultView(AsyncAPIView, BucketResultView):
+    async def get(self, request, task_id):
+        return self.build_response(str(task_id), await aget_task_result(str(task_id), wait=get_wait_seconds(request)))
+
+
+class AsyncBulkDeleteResultView(AsyncAPIView, BulkDeleteResultView):
+    async def get(self, request, task_id):
+        return self.build_response(str(task_id), await aget_task_result(str(task_id), wait=get_wait_seconds(request)))
+
+
+class AsyncFileDeleteResultView(AsyncAPIView, FileDeleteResultView):
+    async def get(self, request, task_id):
+        return self.build_response(str(task_id), await aget_task_result(str(task_id), wait=get_wait_seconds(request)))
+
+
+class AsyncBulkDownloadResultView(AsyncAPIView, BulkDownloadResultView):
+    async def get(self, request, task_id):
+        return self.build_response(str(task_id), await aget_task_result(str(task_id), wait=get_wait_seconds(request)))
+
+
+class AsyncFileDownloadResultView(AsyncAPIView, FileDownloadResultView):
+    async def get(self, request, task_id):
+        result = await aget_task_result(str(task_id), wait=get_wait_seconds(request))
+        # Reading and removing the downloaded file is blocking disk I/O.
+        return await sync_to_async(self.build_response)(str(task_id), result)
+
+
+# ====================================
+
+class TaskEventsView(AsyncAPIView):
+    
+    permission_classes = [IsAdminUser]
+    max_tasks = 100
+    
+    @extend_schema(
+        request=None,
+        responses={
+            200: "text/event-stream with one event per finished task, then an `end` event",
+            400: "Missing task IDs or too many tasks"
+        },
+        summary="Admin-only server-sent events stream of Celery task results.",
+        description=(
+            "Pushes one event per task as soon as it finishes (success or failure) instead of having the client poll each result URL. "
+            "Results are awaited on the result backend's pub/sub channels. The stream closes with an `end` event listing "
+            "the tasks still pending after TASK_EVENTS_TIMEOUT seconds; reconnecting resumes waiting for them. "
+            "Available in the ASGI profile."
+        ),
+        parameters=[
+            OpenApiParameter(name="task_id", type=OpenApiTypes.STR, required=True, many=True, description="Celery task ID; repeat the parameter for several tasks.")
+        ]
+    )
+    
+    async def get(self, request):
+        task_ids = request.query_params.getlist("task_id")
+        if not task_ids:
+            return Response({"error": "At least one task_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(task_ids) > self.max_tasks:
+            return Response({"error": f"Maximum {self.max_tasks} tasks allowed per stream"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(self.stream(task_ids), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Tells nginx to pass events through instead of buffering the response.
+        response["X-Accel-Buffering"] = "no"
+        return response
+    
+    async def stream(self, task_ids):
+        pending = list(dict.fromkeys(task_ids))
+        logger.info(f"[TaskEventsView] Streaming results of {len(pending)} tasks")
+        async for result in await_task_results(pending, settings.TASK_EVENTS_TIMEOUT):
+            pending.remove(result.id)
+            data = {"task_id": result.id, "status": result.state}
+            if result.successful():
+                data["result"] = result.result
+            else:
+                data["error"] = str(result.result)
+            yield self.format_event(result.state.lower(), data, event_id=result.id)
+        yield self.format_event("end", {"pending": pending})
+    
+    @staticmethod
+    def format_event(event, data, event_id=None):
+        lines = [f"id: {event_id}"] if event_id else []
+        lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+        return "\n".join(lines) + "\n\n"
         
       
 #=====================================================================================================
\ No newline at end of file
@@ -0,0 +1,45 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+#======================================== Admin Search ==============================================
+
+class ExactMatchSearchMixin:
+    """
+    Admin search with an exact-match fast path for identifiers support staff paste whole (order numbers, tracking IDs, ids).
+
+    The whole term is first compared with `=` against `exact_search_fields`, which are unique or indexed columns;
+    a hit returns only those rows without running the regular `search_fields` lookups. Otherwise the search falls
+    back to `search_fields`, which should use index-friendly lookups such as `field__startswith` on columns
+    with a `varchar_pattern_ops` index (Django adds one to every unique CharField on PostgreSQL).
+
+    Attributes:
+        exact_search_fields: Lookups compared exactly with the full search term.
+
+    Methods:
+        get_exact_match_query(search_term): Builds the OR of the exact lookups that accept the term.
+        get_search_results(request, queryset, search_term): Returns the exact matches or the regular search results.
+    """
+    exact_search_fields = []
+
+    def get_exact_match_query(self, search_term):
+        query = Q()
+        for lookup in self.exact_search_fields:
+            try:
+                # Drops lookups the term cannot be converted for, e.g. text typed into an integer id.
+                self.model._default_manager.filter(**{lookup: search_term})
+            except (ValueError, TypeError, ValidationError):
+                continue
+            query |= Q(**{lookup: search_term})
+        return query
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term and self.exact_search_fields:
+            query = self.get_exact_match_query(term)
+            if query and queryset.filter(query).exists():
+                return queryset.filter(query), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+#====================================================================================================
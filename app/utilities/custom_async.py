@@ -0,0 +1,199 @@
+from django.http import HttpResponse, HttpResponseNotModified
+from django.conf import settings
+from django.views import View
+from rest_framework.views import APIView
+from rest_framework.request import Request
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import NotAcceptable
+from asgiref.sync import sync_to_async
+from celery import current_app, states
+from celery.backends.redis import RedisBackend
+import asyncio
+from utilities.custom_cache import RESPONSE_CACHE_HITS, acache_get, aget_catalogue_version, get_async_redis
+
+
+#======================================== Async API View ============================================
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, served natively by the ASGI profile.
+
+    Authentication, permissions and throttling may hit the database, so `initial()` runs in a worker thread;
+    the handler itself runs on the event loop and can await async Redis or the async ORM.
+    Under WSGI Django still runs these views, through `async_to_sync`.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+#======================================== Async Catalogue View ======================================
+
+class AsyncCatalogueView(View):
+    """
+    ASGI front for one GET action of a catalogue viewset built on ConditionalGetMixin (and optionally ResponseCacheMixin).
+
+    Revalidations (304) and Redis cache hits are answered on the event loop with async Redis reads, using the
+    viewset's own validators and cache keys, so they match what the sync path produces. Everything else, including
+    cache misses, runs the regular viewset in a worker thread, which also fills the cache for the next request.
+
+    Attributes:
+        viewset_class: The DRF viewset whose action is fronted.
+        basename (str): Router basename of the viewset; part of the response cache key.
+        action (str): The viewset action served, e.g. "list", "retrieve" or "tree".
+        detail (bool): Whether the action is a detail route.
+
+    Methods:
+        get_cached_data(handler, request, version): Reads the cached response data, or None on a miss.
+        render(handler, request, data): Renders the data with the negotiated renderer, or None when it is not JSON.
+    """
+    viewset_class = None
+    basename = None
+    action = "list"
+    detail = False
+
+    @property
+    def sync_view(self):
+        # Extra actions carry their own initkwargs (pagination_class, filter_backends, ...), as the router passes them.
+        initkwargs = getattr(getattr(self.viewset_class, self.action), "kwargs", {})
+        return self.viewset_class.as_view({"get": self.action}, basename=self.basename, detail=self.detail, **initkwargs)
+
+    async def get(self, request, *args, **kwargs):
+        handler = self.viewset_class(basename=self.basename, action=self.action, detail=self.detail, request=request, kwargs=kwargs)
+        handler.format_kwarg = kwargs.get("format")
+        version = await aget_catalogue_version()
+        etag = handler.get_etag(request, version)
+        if handler.is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            data = await self.get_cached_data(handler, request, version)
+            response = None if data is None else self.render(handler, request, data)
+            if response is None:
+                return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+            RESPONSE_CACHE_HITS.labels(view=self.basename, action=self.action).inc()
+        return handler.patch_validators(response, etag)
+
+    async def get_cached_data(self, handler, request, version):
+        if not hasattr(handler, "get_response_cache_key"):
+            return None
+        payload = await acache_get(handler.get_response_cache_key(request, version))
+        return None if payload is None else handler.load_payload(payload)
+
+    def render(self, handler, request, data):
+        try:
+            renderer, media_type = handler.perform_content_negotiation(Request(request))
+        except NotAcceptable:
+            return None
+        if not isinstance(renderer, JSONRenderer):
+            return None
+        return HttpResponse(renderer.render(data, media_type), content_type=media_type)
+
+
+#======================================== Async Task Result =========================================
+
+class TaskResult:
+    """
+    Read-only snapshot of a Celery result-backend entry with the part of the AsyncResult API the polling views use.
+    Unlike AsyncResult, reading `state` or `result` never goes back to the backend.
+    """
+
+    def __init__(self, task_id, meta):
+        self.id = task_id
+        self.state = meta.get("status", states.PENDING)
+        self.result = meta.get("result")
+        self.traceback = meta.get("traceback")
+
+    def ready(self):
+        return self.state in states.READY_STATES
+
+    def successful(self):
+        return self.state == states.SUCCESS
+
+
+async def aget_task_result(task_id, wait=0):
+    """
+    Fetch a task's result with one async Redis GET when the result backend is Redis;
+    other backends are read through their sync client in a worker thread.
+    With `wait`, a task that is not ready yet is awaited for up to that many seconds (long polling).
+    """
+    if wait > 0:
+        results = await_task_results([task_id], wait)
+        try:
+            async for result in results:
+                return result
+        finally:
+            await results.aclose()
+    backend = current_app.backend
+    if isinstance(backend, RedisBackend):
+        payload = await get_async_redis(backend.url).get(backend.get_key_for_task(task_id))
+        meta = backend.decode_result(payload) if payload else {"status": states.PENDING}
+    else:
+        meta = await sync_to_async(backend.get_task_meta)(task_id)
+    return TaskResult(task_id, meta)
+
+
+async def await_task_results(task_ids, timeout):
+    """
+    Yield a TaskResult for each task as soon as it is ready, giving up on the rest after `timeout` seconds.
+
+    With the Redis result backend nothing is polled: Celery publishes every stored result on a channel named after
+    the result key, so this subscribes to those channels, then reads the results already stored (a result stored in
+    between is seen by one of the two). Other backends are polled every TASK_RESULT_POLL_INTERVAL seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    pending = list(dict.fromkeys(task_ids))
+    backend = current_app.backend
+
+    if not isinstance(backend, RedisBackend):
+        while pending:
+            for task_id in list(pending):
+                result = await aget_task_result(task_id)
+                if result.ready():
+                    pending.remove(task_id)
+                    yield result
+            remaining = deadline - loop.time()
+            if not pending or remaining <= 0:
+                return
+            await asyncio.sleep(min(settings.TASK_RESULT_POLL_INTERVAL, remaining))
+        return
+
+    client = get_async_redis(backend.url)
+    keys = {backend.get_key_for_task(task_id): task_id for task_id in pending}
+    pubsub = client.pubsub()
+    await pubsub.subscribe(*keys)
+    try:
+        for key, payload in zip(keys, await client.mget(list(keys))):
+            result = TaskResult(keys[key], backend.decode_result(payload)) if payload else None
+            if result and result.ready():
+                pending.remove(result.id)
+                yield result
+        while pending and (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            task_id = keys.get(message["channel"]) if message else None
+            if task_id not in pending:
+                continue
+            # Progress updates are published too; only final states end the wait for a task.
+            result = TaskResult(task_id, backend.decode_result(message["data"]))
+            if result.ready():
+                pending.remove(task_id)
+                yield result
+    finally:
+        await pubsub.aclose()
+
+
+#====================================================================================================
@@ -0,0 +1,232 @@
+from django.core.cache import cache
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from prometheus_client import Counter
+from hashlib import md5
+from math import log
+from random import random
+from time import time, time_ns
+from logging import getLogger
+from weakref import WeakKeyDictionary
+from redis.asyncio import Redis as AsyncRedis
+from asgiref.sync import sync_to_async
+import asyncio
+import pickle
+import zlib
+
+
+#======================================== Catalogue Version =========================================
+
+logger = getLogger(__name__)
+
+CATALOGUE_VERSION_KEY = "catalogue_version"
+
+
+def get_catalogue_version():
+    """
+    Return the current catalogue version: the time of the last catalogue change in microseconds.
+    If the key was evicted, a fresh timestamp is stored so old validators can never match again.
+    """
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, time_ns() // 1000, None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """
+    Mark the catalogue as changed; every ETag derived from the previous version becomes stale.
+    """
+    version = time_ns() // 1000
+    cache.set(CATALOGUE_VERSION_KEY, version, None)
+    logger.debug(f"Catalogue version bumped to {version}")
+    return version
+
+
+#======================================== Early Recompute Cache =====================================
+
+def xfetch_set_many(values_by_key, delta, timeout):
+    """
+    Store values as (value, delta, expiry) entries in one pipelined write.
+    `delta` is how long the value took to compute; it drives the early-recompute probability on reads.
+    """
+    expiry = time() + timeout
+    cache.set_many({key: (value, delta, expiry) for key, value in values_by_key.items()}, timeout)
+
+
+def xfetch_get_many(keys_by_id, recompute, timeout, beta=1.0, lock_timeout=10):
+    """
+    Read many entries with one MGET and recompute only the missing ones plus those that win the
+    probabilistic early-expiry draw (XFetch), so entries are refreshed before they expire instead of all at once.
+    A refresh of an existing entry also needs a short per-key lock; other readers keep serving the current value.
+
+    Args:
+        keys_by_id (dict): Maps an item id to its cache key.
+        recompute (callable): Receives the ids to refresh and returns a dict of id to value, usually with one query.
+        timeout (int): Lifetime of stored entries in seconds.
+        beta (float): Values above 1 refresh earlier; values below 1 refresh later.
+        lock_timeout (int): Seconds the refresh lock of a key is held at most.
+    """
+    entries = cache.get_many(list(keys_by_id.values()))
+    now = time()
+    values, stale, locks = {}, [], []
+    for item_id, key in keys_by_id.items():
+        entry = entries.get(key)
+        if entry is None:
+            stale.append(item_id)
+            continue
+        value, delta, expiry = entry
+        values[item_id] = value
+        if now - delta * beta * log(random()) >= expiry and cache.add(f"{key}:lock", 1, lock_timeout):
+            locks.append(f"{key}:lock")
+            stale.append(item_id)
+    if stale:
+        started = time()
+        fresh = recompute(stale)
+        xfetch_set_many({keys_by_id[item_id]: value for item_id, value in fresh.items()}, time() - started, timeout)
+        values.update(fresh)
+    if locks:
+        cache.delete_many(locks)
+    return values
+
+
+#======================================== Conditional GET ===========================================
+
+class ConditionalGetMixin:
+    """
+    Conditional-GET support for read-only catalogue viewsets.
+
+    Validators come from the catalogue version counter instead of the data, so answering a revalidation
+    costs one cache read: no query and no serialization. Only the ETag is used: Last-Modified has one-second
+    granularity, so two catalogue changes within the same second would revalidate a stale response.
+
+    Attributes:
+        cache_max_age (int): Seconds shared caches (nginx) may serve the response without revalidating.
+
+    Methods:
+        get_etag(request, version): Builds a strong ETag from the catalogue version and the full request path.
+        is_not_modified(request, etag): Evaluates If-None-Match.
+        patch_validators(response, etag): Adds the ETag and shared-cache headers to a 200 or 304.
+        conditional_response(request, handler, *args, **kwargs): Returns 304 or calls the handler, then adds the validators.
+    """
+    cache_max_age = settings.CATALOGUE_CACHE_MAX_AGE
+
+    def get_etag(self, request, version):
+        accept = request.headers.get("Accept", "")
+        return f'"{md5(f"{version}:{request.get_full_path()}:{accept}".encode()).hexdigest()}"'
+
+    def is_not_modified(self, request, etag):
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        return "*" in etags or etag in etags
+
+    def patch_validators(self, response, etag):
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            patch_cache_control(response, public=True, max_age=self.cache_max_age)
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_etag(request, get_catalogue_version())
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        return self.patch_validators(response, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+
+#======================================== Response Cache ============================================
+
+RESPONSE_CACHE_HITS = Counter("response_cache_hits_total", "Responses served from the versioned Redis response cache", ["view", "action"])
+RESPONSE_CACHE_MISSES = Counter("response_cache_misses_total", "Responses rendered because the versioned Redis response cache had no entry", ["view", "action"])
+
+
+class ResponseCacheMixin:
+    """
+    Server-side cache of serialized list and retrieve responses, stored zlib-compressed in Redis.
+
+    The key contains the catalogue version, so a bump from the catalogue signals orphans every entry at once;
+    orphaned entries simply expire. The full path in the key covers filters, search terms, ordering, page and cursor.
+
+    Attributes:
+        response_cache_timeout (int): Seconds an entry lives once written.
+
+    Methods:
+        get_response_cache_key(request, version): Builds the versioned key for the request.
+        load_payload(payload): Decompresses and unpickles a stored entry.
+        cached_response(request, handler, *args, **kwargs): Serves the cached data or calls the handler and stores its data.
+    """
+    response_cache_timeout = settings.RESPONSE_CACHE_TTL
+
+    def get_response_cache_key(self, request, version):
+        accept = request.headers.get("Accept", "")
+        return f"response:{self.basename}:{version}:{md5(f'{request.get_full_path()}:{accept}'.encode()).hexdigest()}"
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = self.get_response_cache_key(request, get_catalogue_version())
+        payload = cache.get(key)
+        if payload is not None:
+            RESPONSE_CACHE_HITS.labels(view=self.basename, action=self.action).inc()
+            return Response(self.load_payload(payload))
+        RESPONSE_CACHE_MISSES.labels(view=self.basename, action=self.action).inc()
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, zlib.compress(pickle.dumps(response.data)), self.response_cache_timeout)
+        return response
+
+    @staticmethod
+    def load_payload(payload):
+        return pickle.loads(zlib.decompress(payload))
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+
+#======================================== Async Redis ===============================================
+
+_async_clients = WeakKeyDictionary()
+
+
+def get_async_redis(url=None):
+    """
+    Return a redis.asyncio client for `url` (the default cache by default) bound to the running event loop.
+    Clients are kept per loop because asyncio connections cannot be shared between loops; under uvicorn
+    each worker has a single loop, so this is one connection pool per worker process.
+    """
+    url = url or settings.CACHES["default"]["LOCATION"]
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if url not in clients:
+        clients[url] = AsyncRedis.from_url(url, **settings.ASYNC_REDIS_OPTIONS)
+    return clients[url]
+
+
+async def acache_get(key, default=None):
+    """
+    Async counterpart of `cache.get` for the django_redis default cache: the read is awaited on the event loop
+    and decoded with the cache's own key function, serializer and compressor.
+    """
+    value = await get_async_redis().get(cache.client.make_key(key))
+    return default if value is None else cache.client.decode(value)
+
+
+async def aget_catalogue_version():
+    version = await acache_get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_catalogue_version)()
+    return version
+
+
+#====================================================================================================
@@ -0,0 +1,173 @@
+from rest_framework.pagination import BasePagination, PageNumberPagination, CursorPagination
+from rest_framework.request import Request
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Q
+from base64 import b64decode, b64encode
+import json
+
+
+#======================================== Listing Pagination ========================================
+
+class SizedPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination whose page size can be chosen by the client with `?page_size=`, up to `max_page_size`.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination over a unique ordering such as ("-price", "-id").
+
+    DRF's CursorPagination seeks on the first ordering field only and steps over ties on it with OFFSET, giving up
+    after `offset_cutoff` rows. Here the cursor holds the value of every ordering field of the edge row, and a page
+    is the rows past that tuple, e.g. `price < p OR (price = p AND id < i)`: a range scan on the composite index
+    at any depth, with no COUNT(*) or OFFSET. Ordering fields must be non-null model fields.
+
+    Methods:
+        seek_filter(ordering, position): Builds the condition selecting the rows after `position` in `ordering`.
+        decode_cursor(request): Returns the (position, reverse) pair of the request's cursor.
+        encode_cursor(position, reverse): Returns the URL of the page after (or before, if reversed) `position`.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request)
+        ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        return self.page
+
+    def seek_filter(self, ordering, position):
+        query = Q()
+        for index, field in enumerate(ordering):
+            equal = {tie.lstrip("-"): value for tie, value in zip(ordering[:index], position)}
+            lookup = f"{field.lstrip('-')}__{'lt' if field.startswith('-') else 'gt'}"
+            query |= Q(**equal, **{lookup: position[index]})
+        return query
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip("-")) for field in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")))
+            position, reverse = cursor["p"], bool(cursor["r"])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(position)
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        # str() keeps full precision for datetimes and decimals; Django parses these strings back in the lookups.
+        encoded = b64encode(json.dumps({"p": position, "r": int(reverse)}, default=str).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Lets each request pick its pagination mode while the view keeps a single `pagination_class`.
+
+    Page-number mode stays the default for backward compatibility. Clients switch to keyset mode with
+    `?pagination=cursor` and keep following the `next` links, which carry the `cursor` parameter.
+    Keyset mode always pages in `ordering`, so it is refused for requests ordered another way, such as ranked search.
+
+    Attributes:
+        ordering: Unique ordering used by keyset mode; it must be backed by a composite index on the model.
+        ranked_query_params: Query parameters that order results by relevance and cannot be combined with keyset mode.
+
+    Methods:
+        get_paginator(request): Returns the page-number or keyset paginator selected by the request.
+        paginate_queryset(queryset, request, view): Delegates to the selected paginator.
+        get_paginated_response(data): Delegates to the selected paginator.
+    """
+    ordering = ("-created_at", "-id")
+    mode_query_param = "pagination"
+    ranked_query_params = ()
+
+    def get_paginator(self, request: Request):
+        if request.query_params.get(self.mode_query_param) == "cursor" or KeysetPagination.cursor_query_param in request.query_params:
+            ranked = [param for param in self.ranked_query_params if request.query_params.get(param, "").strip()]
+            if ranked:
+                raise ValidationError({self.mode_query_param: f"صفحه‌بندی cursor با مرتب‌سازی بر اساس {ranked[0]} ممکن نیست."})
+            paginator = KeysetPagination()
+            paginator.ordering = self.ordering
+            return paginator
+        return SizedPageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return SizedPageNumberPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = SizedPageNumberPagination().get_schema_operation_parameters(view)
+        parameters.append({
+            "name": self.mode_query_param,
+            "required": False,
+            "in": "query",
+            "description": "Set to 'cursor' for keyset pagination (not available with ranked search).",
+            "schema": {"type": "string", "enum": ["cursor"]},
+        })
+        parameters.append({
+            "name": KeysetPagination.cursor_query_param,
+            "required": False,
+            "in": "query",
+            "description": "Opaque cursor taken from the 'next' or 'previous' link of a keyset page.",
+            "schema": {"type": "string"},
+        })
+        return parameters
+
+
+class ProductPagination(SelectablePagination):
+    ordering = ("-price", "-id")
+    ranked_query_params = ("q",)
+
+
+class CategoryPagination(SelectablePagination):
+    ordering = ("-created_at", "-id")
+
+
+class OrderPagination(SelectablePagination):
+    ordering = ("-created_at", "-id")
+
+
+#====================================================================================================
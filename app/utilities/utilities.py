@@ -106,6 +106,21 @@ def get_client_ip(request):
     return ip
 
 
+# ==========================================================
+
+# Arabic code points that Persian keyboards often produce, mapped to their Persian forms; ZWNJ becomes a word break.
+PERSIAN_NORMALIZE_FROM = "يكىةۀأإآ\u200c"
+PERSIAN_NORMALIZE_TO = "یکیههااا "
+
+
+def normalize_persian(text):
+    """
+    Normalize Arabic variants of Persian letters so search input matches the stored search vectors.
+    The same mapping is applied in SQL with translate() when `Product.search_vector` is built.
+    """
+    return text.translate(str.maketrans(PERSIAN_NORMALIZE_FROM, PERSIAN_NORMALIZE_TO))
+
+
 # ==========================================================
 
 User = get_user_model()